@@ -0,0 +1,210 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from metrics import peak_rss_mb
+
+STAGES = ['users', 'devices', 'kyc_submissions', 'accounts', 'device_ip_history',
+          'transactions_batch', 'transactions_columnar', 'insert']
+
+
+def _measure(results, stage, fn, trace):
+    """Run fn() -> (rows, value) and record seconds, rows/s, peak RSS and traced allocation peak"""
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    rows, value = fn()
+    seconds = time.perf_counter() - start
+    alloc_peak = tracemalloc.get_traced_memory()[1] if trace else None
+    if trace:
+        tracemalloc.stop()
+
+    results[stage] = {
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_s': round(rows / max(seconds, 1e-9), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'alloc_peak_mb': round(alloc_peak / (1024 * 1024), 1) if trace else None,
+    }
+    print(f"   {stage:<24} {rows:>10,} rows {seconds:>8.2f}s {results[stage]['rows_per_s']:>12,.0f} rows/s "
+          f"RSS {results[stage]['peak_rss_mb']:>8.1f} MB")
+    return value
+
+
+def _chunks(frames):
+    """(table name, DataFrame) pairs, with entity tables read through EntityTable.iter_frames()"""
+    for table_name, data in frames:
+        for df in (data.iter_frames() if hasattr(data, 'iter_frames') else [data]):
+            yield table_name, df
+
+
+def _insert_sqlite(frames):
+    """Insert every frame into a throwaway on-disk SQLite database"""
+    fd, path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        rows = 0
+        for table_name, df in _chunks(frames):
+            df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+            df.to_sql(table_name, conn, if_exists='append', index=False, chunksize=50000)
+            rows += len(df)
+        conn.commit()
+        conn.close()
+        return rows
+    finally:
+        os.remove(path)
+
+
+def _insert_postgres(frames, dsn):
+    """COPY every frame into session-local TEMP copies of the tables (the real tables are untouched)"""
+    import psycopg2
+    from bulkload import BARE_TABLES
+    from loader import CopyLoader
+
+    conn = psycopg2.connect(dsn)
+    loader = CopyLoader(conn, commit_rows=50000)
+    try:
+        loader.cursor.execute("CREATE TEMP SEQUENCE account_number_seq START 1000000000")
+        for ddl in BARE_TABLES.values():
+            loader.cursor.execute(ddl.replace('CREATE TABLE', 'CREATE TEMP TABLE', 1))
+        rows = sum(loader.load(table_name, df) for table_name, df in _chunks(frames))
+        loader.commit()
+        return rows
+    finally:
+        loader.close()
+        conn.rollback()
+        conn.close()
+
+
+def run_size(n_users, transactions_per_user=5, seed=42, dsn=None, trace=True):
+    """Benchmark every stage for one population size; returns {stage: metrics}"""
+    from generate import FraudDataGenerator, seed_everything
+
+    seed_everything(seed)  # spawned children start from generate's import-time seed otherwise
+    generator = FraudDataGenerator(n_users=n_users, start_date='2023-01-01', end_date='2025-07-31', seed=seed)
+    n_transactions = n_users * transactions_per_user
+    results = {}
+    frames = []
+
+    print(f"\n▶ {n_users:,} users, {n_transactions:,} transactions")
+    for stage, generate in [
+        ('users', generator.generate_users),
+        ('devices', generator.generate_devices),
+        ('kyc_submissions', generator.generate_kyc_submissions),
+        ('accounts', generator.generate_accounts),
+        ('device_ip_history', generator.generate_device_ip_history),
+    ]:
+        df = _measure(results, stage, lambda: (lambda d: (len(d), d))(generate()), trace)
+        frames.append((stage, df))
+
+    def collect(batches):
+        df = pd.concat(list(batches), ignore_index=True)
+        return len(df), df
+
+    transactions = _measure(results, 'transactions_batch',
+                            lambda: collect(generator.generate_transactions_batch(n_transactions)), trace)
+    _measure(results, 'transactions_columnar',
+             lambda: collect(generator.generate_transactions_columnar(n_transactions)), trace)
+    frames.append(('transactions', transactions))
+
+    if dsn:
+        _measure(results, 'insert', lambda: (_insert_postgres(frames, dsn), None), trace)
+    else:
+        _measure(results, 'insert', lambda: (_insert_sqlite(frames), None), trace)
+    return results
+
+
+def _run_size_in_child(kwargs):
+    return run_size(**kwargs)
+
+
+def run_benchmark(sizes=(1000, 5000, 20000), transactions_per_user=5, seed=42, dsn=None, trace=True):
+    """Run every population size in a fresh process so peak RSS is per size, not cumulative"""
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for n_users in sizes:
+        with ctx.Pool(1) as pool:
+            results[str(n_users)] = pool.apply(_run_size_in_child, (dict(
+                n_users=n_users, transactions_per_user=transactions_per_user, seed=seed, dsn=dsn, trace=trace),))
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'insert_backend': 'postgres' if dsn else 'sqlite',
+            'tracemalloc': trace,
+            'transactions_per_user': transactions_per_user,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """Stages whose rows/s fell more than threshold below the baseline: [(size, stage, base, now)]"""
+    regressions = []
+    print(f"\n{'Size':>8} {'Stage':<24} {'Baseline rows/s':>16} {'Current rows/s':>16} {'Change':>8}")
+    for size, stages in current['results'].items():
+        for stage, metrics in stages.items():
+            base = baseline.get('results', {}).get(size, {}).get(stage)
+            if not base or not base['rows_per_s']:
+                continue
+            change = metrics['rows_per_s'] / base['rows_per_s'] - 1
+            flag = '  ❌' if change < -threshold else ''
+            print(f"{size:>8} {stage:<24} {base['rows_per_s']:>16,.0f} {metrics['rows_per_s']:>16,.0f} "
+                  f"{100 * change:>+7.1f}%{flag}")
+            if change < -threshold:
+                regressions.append((size, stage, base['rows_per_s'], metrics['rows_per_s']))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the data generator stage by stage")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000], help="user population sizes")
+    parser.add_argument('--transactions-per-user', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dsn', help="Postgres connection string for the insert stage (default: SQLite stand-in)")
+    parser.add_argument('--no-tracemalloc', action='store_true', help="skip allocation tracking (faster stages)")
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help="JSON baseline to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed rows/s drop before failing (0.2 = 20%%)")
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = run_benchmark(sizes=args.sizes, transactions_per_user=args.transactions_per_user, seed=args.seed,
+                           dsn=args.dsn, trace=not args.no_tracemalloc)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('tracemalloc') != report['meta']['tracemalloc']:
+            print("\n⚠️  Baseline was recorded with a different tracemalloc setting; rates are not comparable")
+        regressions = compare(report, baseline, threshold=args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) regressed by more than {100 * args.threshold:.0f}%")
+            exit_code = 1
+        else:
+            print(f"\n✅ No stage regressed by more than {100 * args.threshold:.0f}%")
+
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Baseline written to {args.baseline}")
+
+    sys.exit(exit_code)
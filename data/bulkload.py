@@ -0,0 +1,350 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from loader import CopyLoader
+from metrics import Metrics
+
+# Same columns as data/tables/*.sql, without primary keys, UNIQUE or REFERENCES constraints
+BARE_TABLES = {
+    'users': """
+        CREATE TABLE users(
+            user_id INT NOT NULL,
+            first_name VARCHAR(500) NOT NULL,
+            last_name VARCHAR(500) NOT NULL,
+            email VARCHAR(500) NOT NULL,
+            phone_number VARCHAR(500) NOT NULL,
+            gender VARCHAR(20),
+            dob DATE NOT NULL,
+            occupation TEXT,
+            address TEXT,
+            zipcode INT,
+            city VARCHAR(500),
+            state VARCHAR(500),
+            country VARCHAR(500),
+            signup_ts TIMESTAMPTZ,
+            signup_device VARCHAR(500)
+        )""",
+    'devices': """
+        CREATE TABLE devices(
+            device_id INT NOT NULL,
+            user_id INT NOT NULL,
+            device_type VARCHAR(50) NOT NULL,
+            os VARCHAR(50) NOT NULL,
+            first_seen_ts TIMESTAMPTZ DEFAULT now(),
+            last_seen_ts TIMESTAMPTZ,
+            ip_address INET
+        )""",
+    'kyc_submissions': """
+        CREATE TABLE kyc_submissions(
+            submission_id SERIAL,
+            user_id INT NOT NULL,
+            id_type VARCHAR(50),
+            id_num_hash TEXT,
+            doc_issue_country VARCHAR(50),
+            doc_issue_date DATE,
+            selfie_hash_result TEXT,
+            created_at TIMESTAMPTZ DEFAULT now(),
+            processed_at TIMESTAMPTZ,
+            status VARCHAR(50),
+            risk_score INT,
+            reason TEXT,
+            device_id INT NOT NULL,
+            credit_score VARCHAR(50)
+        )""",
+    'accounts': """
+        CREATE TABLE accounts(
+            account_id SERIAL,
+            user_id INT NOT NULL,
+            account_number BIGINT NOT NULL DEFAULT nextval('account_number_seq'),
+            account_type VARCHAR(20) NOT NULL,
+            currency CHAR(3) NOT NULL DEFAULT 'NGN',
+            balance NUMERIC(12,2) DEFAULT 0.00,
+            open_ts TIMESTAMPTZ DEFAULT now(),
+            close_ts TIMESTAMPTZ,
+            status VARCHAR(20) NOT NULL DEFAULT 'active',
+            last_activity_ts TIMESTAMPTZ
+        )""",
+    'device_ip_history': """
+        CREATE TABLE device_ip_history(
+            id SERIAL,
+            device_id INT NOT NULL,
+            ip_address INET NOT NULL,
+            seen_ts TIMESTAMPTZ DEFAULT now()
+        )""",
+    'transactions': """
+        CREATE TABLE transactions(
+            trx_id BIGINT NOT NULL,
+            source_account_id BIGINT NOT NULL,
+            beneficiary_account_id BIGINT,
+            beneficiary_bank VARCHAR(100),
+            trx_type VARCHAR(20) NOT NULL,
+            amount NUMERIC(20,2) NOT NULL,
+            currency CHAR(3) NOT NULL DEFAULT 'NGN',
+            channel VARCHAR(50),
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            narration TEXT,
+            reference_id TEXT,
+            device_ip INET,
+            geo_lat DOUBLE PRECISION NOT NULL,
+            geo_long DOUBLE PRECISION NOT NULL,
+            country CHAR(5) DEFAULT 'NG',
+            auth_result BOOLEAN DEFAULT 'FALSE',
+            created_at TIMESTAMPTZ DEFAULT now(),
+            processed_at TIMESTAMPTZ,
+            is_fraud BOOLEAN DEFAULT FALSE,
+            reason TEXT
+        )""",
+    'fraud_label': """
+        CREATE TABLE fraud_label(
+            trx_id INT NOT NULL,
+            is_fraud BOOLEAN NOT NULL DEFAULT FALSE,
+            label_source VARCHAR(20) NOT NULL,
+            fraud_type VARCHAR(50),
+            labelling_ts TIMESTAMPTZ,
+            notes TEXT
+        )""",
+}
+
+# Index-backed constraints, one ALTER per table so tables are indexed in parallel
+KEYS = {
+    'users': "ALTER TABLE users ADD CONSTRAINT users_pkey PRIMARY KEY (user_id)",
+    'devices': "ALTER TABLE devices ADD CONSTRAINT devices_pkey PRIMARY KEY (device_id)",
+    'kyc_submissions': "ALTER TABLE kyc_submissions ADD CONSTRAINT kyc_submissions_pkey PRIMARY KEY (submission_id)",
+    'accounts': "ALTER TABLE accounts ADD CONSTRAINT accounts_pkey PRIMARY KEY (account_id), "
+                "ADD CONSTRAINT accounts_account_number_key UNIQUE (account_number)",
+    'device_ip_history': "ALTER TABLE device_ip_history ADD CONSTRAINT device_ip_history_pkey PRIMARY KEY (id)",
+    'transactions': "ALTER TABLE transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (trx_id), "
+                    "ADD CONSTRAINT transactions_reference_id_key UNIQUE (reference_id)",
+    'fraud_label': "ALTER TABLE fraud_label ADD CONSTRAINT fraud_label_pkey PRIMARY KEY (trx_id)",
+}
+
+# (table, constraint name, definition); added NOT VALID, then validated per table in parallel
+CHECKED_CONSTRAINTS = [
+    ('devices', 'devices_user_id_fkey', "FOREIGN KEY (user_id) REFERENCES users(user_id)"),
+    ('kyc_submissions', 'kyc_submissions_user_id_fkey', "FOREIGN KEY (user_id) REFERENCES users(user_id)"),
+    ('kyc_submissions', 'kyc_submissions_device_id_fkey', "FOREIGN KEY (device_id) REFERENCES devices(device_id)"),
+    ('accounts', 'accounts_user_id_fkey', "FOREIGN KEY (user_id) REFERENCES users(user_id)"),
+    ('accounts', 'check_account_number_length', "CHECK (account_number <= 9999999999)"),
+    ('device_ip_history', 'device_ip_history_device_id_fkey', "FOREIGN KEY (device_id) REFERENCES devices(device_id)"),
+    ('transactions', 'transactions_source_account_id_fkey',
+     "FOREIGN KEY (source_account_id) REFERENCES accounts(account_id)"),
+    ('transactions', 'transactions_beneficiary_account_id_fkey',
+     "FOREIGN KEY (beneficiary_account_id) REFERENCES accounts(account_id)"),
+    ('fraud_label', 'fraud_label_trx_id_fkey', "FOREIGN KEY (trx_id) REFERENCES transactions(trx_id)"),
+]
+
+
+class PhaseTimer:
+    """Wall-clock time per named phase (also recorded as bulk_phase_seconds when metrics is given)"""
+
+    def __init__(self, metrics=None):
+        self.phases = {}
+        self.metrics = metrics
+
+    @contextmanager
+    def phase(self, name):
+        print(f"⏱  {name}...")
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            if self.metrics is not None:
+                self.metrics.observe('bulk_phase_seconds', seconds, phase=name)
+            print(f"   ✓ {name}: {self.phases[name]:.2f}s\n")
+
+    def report(self):
+        total = sum(self.phases.values())
+        print(f"{'Phase':<32} {'Seconds':>10} {'Share':>8}")
+        for name, seconds in self.phases.items():
+            print(f"{name:<32} {seconds:>10.2f} {100 * seconds / max(total, 1e-9):>7.1f}%")
+        print(f"{'total':<32} {total:>10.2f}")
+
+
+def _execute(pool, statements, maintenance_work_mem=None):
+    """Run statements in one transaction on a pooled connection"""
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            if maintenance_work_mem:
+                cursor.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+            for sql in statements:
+                cursor.execute(sql)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def _execute_parallel(pool, groups, workers, maintenance_work_mem=None):
+    """Run each group of statements in its own transaction, up to `workers` groups at a time"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(_execute, pool, group, maintenance_work_mem) for group in groups]:
+            future.result()
+
+
+def _copy_worker(pool, work, commit_rows, metrics=None):
+    """Drain (table, DataFrame) items from the work queue into COPY on one pooled connection"""
+    conn = pool.getconn()
+    loader = CopyLoader(conn, commit_rows=commit_rows, metrics=metrics)
+    try:
+        while True:
+            item = work.get()
+            if item is None:
+                break
+            loader.load(*item)
+        loader.commit()
+        return loader.stats
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        loader.close()
+        pool.putconn(conn)
+
+
+def _put(work, item, futures):
+    """Queue an item for the COPY workers, surfacing a worker failure instead of blocking forever"""
+    while True:
+        try:
+            work.put(item, timeout=1)
+            return
+        except queue.Full:
+            for future in futures:
+                if future.done() and future.exception():
+                    raise future.exception()
+
+
+def _table_exists(pool, table_name):
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table_name,))
+            return cursor.fetchone()[0]
+    finally:
+        conn.rollback()
+        pool.putconn(conn)
+
+
+def bulk_load(generator, conn_string, n_transactions=5000000, columnar=False, commit_rows=50000,
+              n_shards=0, max_workers=None, pool_size=4, maintenance_work_mem='512MB', replace_labels=False,
+              metrics=None):
+    """Recreate the tables without keys, COPY every table concurrently, then add and validate constraints.
+
+    All tables are loaded at once by pool_size COPY workers fed from one bounded queue: entity tables
+    as soon as they are generated, then transaction batches while later batches are still being
+    generated. Primary keys and UNIQUE indexes are then built per table in parallel, foreign keys
+    are added NOT VALID and validated per table in parallel. Existing tables are dropped, except
+    fraud_label (replay and analyst labels), which is kept unless replace_labels=True; a kept table
+    gets its trx_id foreign key back NOT VALID, since its labels refer to the previous data.
+    Timers and counters go to `metrics` as in push_to_db (COPY timings are summed over the workers),
+    plus bulk_phase_seconds per phase.
+    """
+    print(f"\n{'=' * 60}")
+    print(f"BULK LOAD: {n_transactions:,} transactions over {pool_size} connections")
+    print(f"Users: {generator.n_users:,} | Period: {generator.start_date.date()} to {generator.end_date.date()}")
+    print(f"{'=' * 60}\n")
+
+    metrics = metrics or Metrics.from_env()
+    generator.metrics = metrics
+    timer = PhaseTimer(metrics)
+    pool = ThreadedConnectionPool(1, pool_size, conn_string)
+    try:
+        keep_labels = not replace_labels and _table_exists(pool, 'fraud_label')
+        if keep_labels:
+            print("⚠️  Keeping the existing fraud_label table (its labels refer to the previous trx_ids); "
+                  "pass --replace-labels to recreate it\n")
+        tables = {name: sql for name, sql in BARE_TABLES.items() if not (keep_labels and name == 'fraud_label')}
+
+        with timer.phase('create bare tables'):
+            _execute(pool, [
+                f"DROP TABLE IF EXISTS {', '.join(reversed(list(tables)))} CASCADE",
+                "DROP SEQUENCE IF EXISTS account_number_seq CASCADE",
+                "CREATE SEQUENCE account_number_seq START 1000000000 MAXVALUE 9999999999 NO CYCLE",
+                *tables.values(),
+            ])
+
+        with timer.phase('generate + COPY (all tables)'), metrics.profiling():
+            work = queue.Queue(maxsize=2 * pool_size)
+            with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                futures = [executor.submit(_copy_worker, pool, work, commit_rows, metrics) for _ in range(pool_size)]
+                try:
+                    for label, table_name, generate in generator.entity_steps():
+                        with metrics.timer('generate_seconds', stage=table_name):
+                            table = generate()
+                        for df in table.iter_frames():
+                            _put(work, (table_name, df), futures)
+                        print(f"   ✓ Generated {len(table):,} {label}")
+
+                    start_time = datetime.now()
+                    total = 0
+                    batches = generator.transaction_batches(n_transactions, columnar=columnar, n_shards=n_shards,
+                                                            max_workers=max_workers)
+                    for batch_num, batch_df in enumerate(
+                            metrics.timed_iter(batches, 'generate_seconds', stage='transactions'), start=1):
+                        _put(work, ('transactions', batch_df), futures)
+                        metrics.record_batch(batch_df)
+                        total += len(batch_df)
+                        metrics.emit('batch', batch=batch_num, rows=total)
+                    elapsed = (datetime.now() - start_time).total_seconds()
+                    print(f"   ✓ Generated {total:,} transactions ({total / max(elapsed, 1e-9):,.0f} txn/s)")
+                finally:
+                    for _ in futures:
+                        _put(work, None, futures)
+                stats = [future.result() for future in futures]
+
+        with timer.phase('primary keys + unique indexes'):
+            _execute_parallel(pool, [[KEYS[table]] for table in tables], pool_size, maintenance_work_mem)
+
+        with timer.phase('add constraints NOT VALID'):
+            _execute(pool, [f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID"
+                            for table, name, definition in CHECKED_CONSTRAINTS])
+
+        with timer.phase('validate constraints'):
+            by_table = {}
+            for table, name, _ in CHECKED_CONSTRAINTS:
+                if table not in tables:
+                    continue
+                by_table.setdefault(table, []).append(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+            _execute_parallel(pool, list(by_table.values()), pool_size, maintenance_work_mem)
+
+        with timer.phase('analyze'):
+            _execute(pool, [f"ANALYZE {table}" for table in BARE_TABLES])
+
+        rows = {}
+        for worker_stats in stats:
+            for table_name, table_stats in worker_stats.items():
+                rows[table_name] = rows.get(table_name, 0) + table_stats['rows']
+
+        print(f"{'=' * 60}")
+        print("BULK LOAD TIMING")
+        print(f"{'=' * 60}")
+        timer.report()
+        print()
+        print(f"{'Table':<20} {'Rows':>12}")
+        for table_name in BARE_TABLES:
+            if table_name in rows:
+                print(f"{table_name:<20} {rows[table_name]:>12,}")
+        print()
+        print(f"{'=' * 60}")
+        print("STAGE BREAKDOWN")
+        print(f"{'=' * 60}")
+        metrics.report()
+        print()
+        return timer.phases
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        raise
+    finally:
+        pool.closeall()
+        metrics.close()
+        generator.metrics = None
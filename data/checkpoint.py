@@ -0,0 +1,56 @@
+import os
+import pickle
+import random
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+def capture_rng_state(generator, faker):
+    """Snapshot every random stream the generator draws from."""
+    return {
+        'random': random.getstate(),
+        'numpy': np.random.get_state(),
+        'generator_rng': generator.rng.bit_generator.state,
+        'faker': faker.random.getstate(),
+    }
+
+
+def restore_rng_state(generator, faker, rng_state):
+    """Restore the random streams captured by capture_rng_state."""
+    random.setstate(rng_state['random'])
+    np.random.set_state(rng_state['numpy'])
+    generator.rng.bit_generator.state = rng_state['generator_rng']
+    faker.random.setstate(rng_state['faker'])
+
+
+def save_checkpoint(path, generator, faker, **meta):
+    """Atomically persist the generator's stream state and RNG states to path.
+
+    Written to a temporary file, fsynced and renamed over the previous checkpoint, so a crash leaves
+    either the old or the new checkpoint, never a torn one.
+    """
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'stream': generator.stream_state,
+        'rng': capture_rng_state(generator, faker),
+        **meta,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """Load a checkpoint written by save_checkpoint, or None if there is none."""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}: {checkpoint.get('version')}")
+    return checkpoint
@@ -0,0 +1,314 @@
+import os
+from bisect import bisect_right
+from collections.abc import Mapping
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class EntityRow(Mapping):
+    """Read-only dict-like view of one row of an EntityTable"""
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, column):
+        return self.table.value(column, self.index)
+
+    def __iter__(self):
+        return iter(self.table.row_columns(self.index))
+
+    def __len__(self):
+        return len(self.table.row_columns(self.index))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class EntityTable:
+    """Columnar, append-only store for an entity table (users, accounts, devices, ...).
+
+    Rows are appended as dicts and compacted every chunk_rows rows into per-column NumPy chunks:
+    numbers and timestamps as native dtypes, repetitive columns as categorical codes, other strings as
+    UTF-8 bytes. Chunks are only concatenated when the table is read, so appending stays linear.
+    Iteration and indexing return EntityRow views, so code written against lists of dicts keeps
+    working; to_frame() and iter_frames() are the fast paths for bulk access. spill() writes the
+    chunks to memory-mapped .npy files, and every later chunk goes to a file of its own, so
+    populations larger than RAM can be generated.
+    """
+
+    def __init__(self, categorical=(), chunk_rows=100000):
+        self.categorical = set(categorical)
+        self.chunk_rows = chunk_rows
+        self.columns = []
+        self.kinds = {}
+        self.chunks = {}  # stem -> list of arrays, one per compacted chunk
+        self.starts = []  # first row of each chunk
+        self.categories = {}
+        self.tz = {}
+        self.size = 0
+        self.pending = []
+        self.spill_dir = None
+        self.getters = {}
+
+    def __len__(self):
+        return self.size + len(self.pending)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('EntityTable index out of range')
+        return EntityRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield EntityRow(self, index)
+
+    def __getstate__(self):
+        state = dict(self.__dict__, getters={})
+        if self.spill_dir:
+            state['chunks'] = None  # reopened from spill_dir instead of copied
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.chunks is None:
+            self.chunks = {stem: [np.load(self._chunk_path(stem, k), mmap_mode='r') for k in range(len(self.starts))]
+                           for stem in self._stems()}
+
+    @classmethod
+    def from_cursor(cls, cursor, columns, categorical=(), chunk_rows=100000, spill_dir=None):
+        """Load the rows of an executed query, fetching and compacting chunk_rows at a time (straight into
+        spill_dir when given)"""
+        table = cls(categorical=categorical, chunk_rows=chunk_rows)
+        if spill_dir:
+            table.spill(spill_dir)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            table.append_frame(pd.DataFrame(rows, columns=columns))
+        table.columns = table.columns or list(columns)
+        return table
+
+    def append(self, row):
+        """Append one row (a dict keyed by column name)"""
+        self.pending.append(row)
+        if len(self.pending) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Compact pending rows into a new chunk of the column arrays"""
+        if self.pending:
+            pending, self.pending = self.pending, []
+            self.append_frame(pd.DataFrame(pending))
+
+    def append_frame(self, df):
+        """Append a DataFrame of rows as a new chunk"""
+        if df.empty:
+            return
+        if not self.columns:
+            self.columns = list(df.columns)
+        self.getters = {}
+        for column in self.columns:
+            series = df[column] if column in df else pd.Series([None] * len(df), dtype=object)
+            kind = self.kinds.setdefault(column, self._kind(column, series))
+            getattr(self, f'_append_{kind}')(column, series)
+        self.starts.append(self.size)
+        self.size += len(df)
+
+    def _kind(self, column, series):
+        if column in self.categorical:
+            return 'category'
+        if pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            return 'number'
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return 'datetime'
+        present = series.dropna()
+        if present.empty or all(isinstance(v, str) for v in present):
+            return 'text'
+        if all(isinstance(v, datetime) for v in present):
+            return 'datetime'
+        return 'category'
+
+    def _append_number(self, column, series):
+        values = series.to_numpy() if series.dtype != object else pd.to_numeric(series).to_numpy()
+        self._extend(f'{column}.values', values)
+
+    def _append_datetime(self, column, series):
+        values = pd.to_datetime(series, utc=series.dtype == object or None)
+        if values.dt.tz is not None:
+            self.tz.setdefault(column, str(values.dt.tz))
+            values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+        self._extend(f'{column}.values', values.to_numpy(dtype='datetime64[ns]'))
+
+    def _append_text(self, column, series):
+        nulls = series.isna().to_numpy()
+        encoded = [b'' if null else str(v).encode('utf-8') for v, null in zip(series, nulls)]
+        self._extend(f'{column}.values', np.array(encoded, dtype='S'))
+        self._extend(f'{column}.nulls', nulls)
+
+    def _append_category(self, column, series):
+        categories = self.categories.get(column, np.array([], dtype=object))
+        values = series.to_numpy(dtype=object)
+        present = pd.unique(values[~pd.isna(values)])
+        new = present[~pd.Index(present).isin(categories)]
+        categories = self.categories[column] = np.concatenate([categories, new.astype(object)])
+        self._extend(f'{column}.codes', pd.Index(categories).get_indexer(values).astype(np.int32))
+
+    def _extend(self, stem, values):
+        chunks = self.chunks.setdefault(stem, [])
+        if self.spill_dir:
+            values = self._save(stem, len(chunks), values)
+        chunks.append(values)
+
+    def _chunk_path(self, stem, k):
+        return os.path.join(self.spill_dir, f'{stem}.{k:05d}.npy')
+
+    def _save(self, stem, k, values):
+        np.save(self._chunk_path(stem, k), values)
+        return np.load(self._chunk_path(stem, k), mmap_mode='r')
+
+    def _consolidate(self):
+        """Concatenate in-memory chunks into one per column (spilled chunks stay separate files)"""
+        if len(self.starts) > 1 and not self.spill_dir:
+            for stem, chunks in self.chunks.items():
+                chunks[:] = [np.concatenate(chunks)]
+            self.starts = [0]
+            self.getters = {}
+
+    def _column(self, stem):
+        """Whole column array (concatenated on demand when it is split over spilled chunks)"""
+        self._consolidate()
+        chunks = self.chunks[stem]
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def _item(self, stem):
+        """index -> Python scalar for a column, without concatenating its chunks"""
+        self._consolidate()
+        chunks = self.chunks[stem]
+        if len(chunks) == 1:
+            return chunks[0].item
+        starts = self.starts
+
+        def item(index):
+            k = bisect_right(starts, index) - 1
+            return chunks[k].item(index - starts[k])
+        return item
+
+    def _getter(self, column):
+        """index -> value of column boxed as the Python type that was appended (cached per column)"""
+        kind = self.kinds.get(column)
+        if kind is None:
+            raise KeyError(column)
+        if kind == 'category':
+            code, categories = self._item(f'{column}.codes'), self.categories[column]
+            return lambda index: None if (c := code(index)) < 0 else categories[c]
+        value = self._item(f'{column}.values')
+        if kind == 'text':
+            null = self._item(f'{column}.nulls')
+            return lambda index: None if null(index) else value(index).decode('utf-8')
+        if kind == 'datetime':
+            tz = self.tz.get(column)
+
+            def timestamp(index):
+                ns = value(index)  # datetime64[ns].item() is integer nanoseconds, None for NaT
+                if ns is None:
+                    return None
+                ts = pd.Timestamp(ns)
+                return ts.tz_localize('UTC').tz_convert(tz) if tz else ts
+            return timestamp
+        if any(chunk.dtype.kind == 'f' for chunk in self.chunks[f'{column}.values']):
+            return lambda index: None if (v := value(index)) != v else v
+        return value
+
+    def _stems(self):
+        for column, kind in self.kinds.items():
+            if kind == 'category':
+                yield f'{column}.codes'
+            else:
+                yield f'{column}.values'
+                if kind == 'text':
+                    yield f'{column}.nulls'
+
+    def spill(self, directory):
+        """Move the column arrays to memory-mapped files under directory (later chunks go there too)"""
+        self.flush()
+        self._consolidate()
+        os.makedirs(directory, exist_ok=True)
+        self.spill_dir = directory
+        self.getters = {}
+        for stem, chunks in self.chunks.items():
+            chunks[:] = [self._save(stem, k, chunk) for k, chunk in enumerate(chunks)]
+
+    def row_columns(self, index):
+        return list(self.pending[index - self.size]) if index >= self.size else self.columns
+
+    def value(self, column, index):
+        """Value of column at row index, boxed as the Python type that was appended"""
+        if index >= self.size:
+            return self.pending[index - self.size][column]
+        getter = self.getters.get(column)
+        if getter is None:
+            getter = self.getters[column] = self._getter(column)
+        return getter(index)
+
+    def _frame(self, columns, array, n_rows):
+        """DataFrame of columns from array(stem) -> that stem's values for the rows being built"""
+        data = {}
+        for column in columns:
+            kind = self.kinds.get(column)
+            if kind is None:
+                data[column] = pd.Series([None] * n_rows, dtype=object)
+            elif kind == 'category':
+                data[column] = pd.Categorical.from_codes(array(f'{column}.codes'),
+                                                         categories=pd.Index(self.categories[column]))
+            elif kind == 'text':
+                decoded = pd.Series(array(f'{column}.values')).str.decode('utf-8')
+                data[column] = decoded.where(~array(f'{column}.nulls'), None)
+            elif kind == 'datetime':
+                values = pd.DatetimeIndex(array(f'{column}.values'))
+                data[column] = values.tz_localize('UTC').tz_convert(self.tz[column]) if column in self.tz else values
+            else:
+                data[column] = np.asarray(array(f'{column}.values'))
+        return pd.DataFrame(data, columns=columns)
+
+    def to_frame(self, columns=None):
+        """Materialise the table (or a subset of its columns) as a DataFrame"""
+        self.flush()
+        return self._frame(list(columns or self.columns), self._column, self.size)
+
+    def iter_frames(self, columns=None):
+        """Yield the table (or a subset of its columns) as DataFrames of at most chunk_rows rows.
+
+        Frames are cut from one chunk at a time, so a spilled table is streamed file by file instead of
+        being concatenated in RAM; their indexes continue across frames like to_frame()'s.
+        """
+        self.flush()
+        columns = list(columns or self.columns)
+        chunks = self.chunks
+        for k, (start, end) in enumerate(zip(self.starts, self.starts[1:] + [self.size])):
+            for lo in range(start, end, self.chunk_rows):
+                hi = min(lo + self.chunk_rows, end)
+                frame = self._frame(columns, lambda stem: chunks[stem][k][lo - start:hi - start], hi - lo)
+                frame.index = pd.RangeIndex(lo, hi)
+                yield frame
+
+    def records(self, columns):
+        """Iterate the rows as plain dicts of the given columns, chunk_rows at a time.
+
+        Values are boxed like EntityRow reads (missing values are None) at a fraction of the cost, for
+        loops that walk a whole table.
+        """
+        for frame in self.iter_frames(columns):
+            part = frame.astype(object)
+            yield from part.where(part.notna(), None).to_dict('records')
+
+    def nbytes(self):
+        """Bytes held by the column arrays (memory-mapped arrays count their file size)"""
+        return (sum(chunk.nbytes for chunks in self.chunks.values() for chunk in chunks)
+                + sum(c.nbytes for c in self.categories.values()))
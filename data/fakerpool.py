@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class FakerPool:
+    """Pre-generated pools of Faker values per provider, sampled by index with NumPy.
+
+    Each (provider, kwargs) pair gets `size` values generated up front; draws are index lookups into
+    that pool, and the pool is regenerated after `refresh_every` draws so long runs keep the
+    provider's spread of values. resize() overrides both for one provider. Providers whose values must stay unique (emails, IPs, UUIDs) or
+    identify a person (names with birth dates, phone numbers, addresses) should not be pooled:
+    repeated values would link unrelated records.
+    """
+
+    def __init__(self, faker, rng, size=10000, refresh_every=1000000, index_chunk=4096):
+        self.faker = faker
+        self.rng = rng
+        self.size = size
+        self.refresh_every = refresh_every
+        self.index_chunk = index_chunk
+        self.sizes = {}  # provider -> (size, refresh_every)
+        self.pools = {}
+        self.draws = {}
+        self.indices = {}
+
+    def __getstate__(self):
+        # The Faker instance is owned (and checkpointed) by the caller, who reattaches it after unpickling
+        state = dict(self.__dict__)
+        state['faker'] = None
+        return state
+
+    def resize(self, provider, size, refresh_every=None):
+        """Pool `size` values of provider (regenerated after refresh_every draws, default: the pool's own)"""
+        self.sizes[provider] = (size, refresh_every or self.refresh_every)
+        for key in [key for key in self.pools if key[0] == provider]:
+            del self.pools[key]
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('sizes', {})  # checkpoints written before resize() existed
+
+    def _key(self, provider, kwargs):
+        return (provider, tuple(sorted(kwargs.items())))
+
+    def _pool(self, key):
+        provider, kwargs = key
+        size, refresh_every = self.sizes.get(provider, (self.size, self.refresh_every))
+        pool = self.pools.get(key)
+        if pool is None or self.draws[key] >= refresh_every:
+            method = getattr(self.faker, provider)
+            pool = self.pools[key] = np.array([method(**dict(kwargs)) for _ in range(size)], dtype=object)
+            self.draws[key] = 0
+            self.indices.pop(key, None)
+        return pool
+
+    def sample(self, provider, n, **kwargs):
+        """Draw n values of provider(**kwargs) as an object array."""
+        key = self._key(provider, kwargs)
+        pool = self._pool(key)
+        self.draws[key] += n
+        return pool[self.rng.integers(0, len(pool), n)]
+
+    def one(self, provider, **kwargs):
+        """Draw a single value; indices are pre-drawn in chunks to keep per-row overhead low."""
+        key = self._key(provider, kwargs)
+        pool = self._pool(key)
+        self.draws[key] += 1
+        indices, pos = self.indices.get(key, (None, 0))
+        if indices is None or pos >= len(indices):
+            indices, pos = self.rng.integers(0, len(pool), self.index_chunk), 0
+        self.indices[key] = (indices, pos + 1)
+        return pool[indices[pos]]
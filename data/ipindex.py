@@ -0,0 +1,63 @@
+class IpFanoutIndex:
+    """ip_address -> distinct user_ids / device_ids, built from `devices` and `device_ip_history`.
+
+    Lookups and incremental updates are O(1); both the generator and the rule engine use it to answer
+    "how many users share this IP".
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.devices = {}
+
+    def __len__(self):
+        return len(self.users)
+
+    def add(self, ip_address, device_id, user_id):
+        """Record that device_id (owned by user_id) was seen on ip_address."""
+        if ip_address is None:
+            return
+        ip_address = str(ip_address)
+        self.users.setdefault(ip_address, set()).add(user_id)
+        self.devices.setdefault(ip_address, set()).add(device_id)
+
+    def user_count(self, ip_address):
+        """Number of distinct users seen on ip_address."""
+        users = self.users.get(str(ip_address)) if ip_address is not None else None
+        return len(users) if users else 0
+
+    def device_count(self, ip_address):
+        """Number of distinct devices seen on ip_address."""
+        devices = self.devices.get(str(ip_address)) if ip_address is not None else None
+        return len(devices) if devices else 0
+
+    @classmethod
+    def from_entities(cls, devices, device_ip_history):
+        """Build from the generator's device dicts and device_ip_history dicts (device_id, ip_address)."""
+        index = cls()
+        device_users = {}
+        for device in devices:
+            device_users[device['device_id']] = device['user_id']
+            index.add(device.get('ip_address'), device['device_id'], device['user_id'])
+        for entry in device_ip_history:
+            user_id = device_users.get(entry['device_id'])
+            if user_id is not None:
+                index.add(entry['ip_address'], entry['device_id'], user_id)
+        return index
+
+    @classmethod
+    def from_cursor(cls, cursor, fetch_size=100000):
+        """Build from the `devices` and `device_ip_history` tables."""
+        index = cls()
+        cursor.execute("""
+            SELECT ip_address, device_id, user_id FROM devices
+            UNION ALL
+            SELECT h.ip_address, h.device_id, d.user_id
+            FROM device_ip_history h JOIN devices d ON d.device_id = h.device_id
+        """)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for ip_address, device_id, user_id in rows:
+                index.add(ip_address, device_id, user_id)
+        return index
@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def _digest(id_num_hash):
+    """32-byte key for an id_num_hash (the table stores hex SHA-256; anything else is hashed first)"""
+    try:
+        key = bytes.fromhex(id_num_hash)
+    except ValueError:
+        key = b''
+    return key if len(key) == 32 else hashlib.sha256(str(id_num_hash).encode()).digest()
+
+
+def _add(mapping, key, value):
+    """mapping[key] holds one value as-is and only becomes a set once a second distinct value arrives"""
+    current = mapping.get(key)
+    if current is None:
+        mapping[key] = value
+    elif isinstance(current, set):
+        current.add(value)
+    elif current != value:
+        mapping[key] = {current, value}
+
+
+def _values(mapping, key):
+    current = mapping.get(key)
+    if current is None:
+        return set()
+    return current if isinstance(current, set) else {current}
+
+
+class BloomFilter:
+    """Bit-array Bloom filter over id_num_hash digests: no false negatives, false_positive_rate at capacity.
+
+    The k probe positions come from double hashing two 64-bit words of the SHA-256 digest itself,
+    so membership costs no extra hashing.
+    """
+
+    def __init__(self, n_bits, n_hashes):
+        self.n_bits = n_bits
+        self.n_hashes = n_hashes
+        self.bits = np.zeros((n_bits + 7) // 8, dtype=np.uint8)
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate=0.001):
+        n_bits = max(64, int(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)))
+        return cls(n_bits, max(1, round(n_bits / max(capacity, 1) * math.log(2))))
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def _positions(self, digest):
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def add(self, id_num_hash):
+        for position in self._positions(_digest(id_num_hash)):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, id_num_hash):
+        bits = self.bits
+        return all(bits[position >> 3] >> (position & 7) & 1 for position in self._positions(_digest(id_num_hash)))
+
+
+class IdentityIndex:
+    """id_num_hash -> distinct user_ids / device_ids from `kyc_submissions`, plus a Bloom pre-filter of
+    known-stolen identity hashes.
+
+    check() answers "has this identity document already been used by someone else" in O(1), and
+    screen() checks a new submission and then records it, as a KYC service would per request.
+    """
+
+    def __init__(self, stolen=None):
+        self.users = {}
+        self.devices = {}
+        self.stolen = stolen
+
+    def __len__(self):
+        return len(self.users)
+
+    def add(self, id_num_hash, user_id, device_id=None):
+        """Record that user_id (on device_id) submitted the identity document id_num_hash."""
+        if id_num_hash is None:
+            return
+        key = _digest(id_num_hash)
+        _add(self.users, key, user_id)
+        if device_id is not None and device_id == device_id:
+            _add(self.devices, key, device_id)
+
+    def user_ids(self, id_num_hash):
+        return _values(self.users, _digest(id_num_hash)) if id_num_hash is not None else set()
+
+    def device_ids(self, id_num_hash):
+        return _values(self.devices, _digest(id_num_hash)) if id_num_hash is not None else set()
+
+    def check(self, id_num_hash, user_id=None, device_id=None):
+        """Risk signals for a submission: other users/devices already seen with this identity hash,
+        and whether it may be a known-stolen document (Bloom filter: false positives possible)"""
+        key = _digest(id_num_hash) if id_num_hash is not None else None
+        other_users = _values(self.users, key) - {user_id} if key is not None else set()
+        other_devices = _values(self.devices, key) - {device_id} if key is not None else set()
+        return {'identity_seen': bool(other_users), 'other_users': len(other_users),
+                'other_devices': len(other_devices),
+                'stolen_suspect': self.stolen is not None and key is not None and id_num_hash in self.stolen}
+
+    def screen(self, submission):
+        """check() then add() for a `kyc_submissions`-shaped mapping"""
+        signals = self.check(submission.get('id_num_hash'), submission.get('user_id'), submission.get('device_id'))
+        self.add(submission.get('id_num_hash'), submission.get('user_id'), submission.get('device_id'))
+        return signals
+
+    def reused(self, min_users=2):
+        """Number of identity hashes seen with at least min_users distinct users"""
+        return sum(1 for users in self.users.values() if isinstance(users, set) and len(users) >= min_users)
+
+    @staticmethod
+    def _grouped(keys, values):
+        """{key: value or set of values} built with one pandas pass instead of per-row _add calls"""
+        frame = pd.DataFrame({'key': keys, 'value': values}).dropna().drop_duplicates()
+        counts = frame['key'].map(frame['key'].value_counts())
+        single = frame[counts == 1]
+        mapping = dict(zip(single['key'].tolist(), single['value'].tolist()))
+        for key, group in frame[counts > 1].groupby('key', sort=False)['value']:
+            mapping[key] = set(group.tolist())
+        return mapping
+
+    @classmethod
+    def from_frame(cls, kyc_submissions, stolen=None):
+        """Bulk build from a frame with id_num_hash, user_id and device_id columns."""
+        index = cls(stolen)
+        frame = kyc_submissions.dropna(subset=['id_num_hash'])
+        keys = [_digest(h) for h in frame['id_num_hash'].tolist()]
+        index.users = cls._grouped(keys, frame['user_id'].astype('Int64').to_numpy(dtype=object))
+        index.devices = cls._grouped(keys, frame['device_id'].astype('Int64').to_numpy(dtype=object))
+        return index
+
+    @classmethod
+    def from_entities(cls, kyc_submissions, stolen=None):
+        """Build from the generator's kyc_submissions dicts."""
+        index = cls(stolen)
+        for kyc in kyc_submissions:
+            index.add(kyc['id_num_hash'], kyc['user_id'], kyc.get('device_id'))
+        return index
+
+    @classmethod
+    def from_cursor(cls, cursor, stolen=None, fetch_size=500000):
+        """Build from the `kyc_submissions` table, fetch_size rows at a time."""
+        index = cls(stolen)
+        cursor.execute("SELECT id_num_hash, user_id, device_id FROM kyc_submissions WHERE id_num_hash IS NOT NULL")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            chunk = cls.from_frame(pd.DataFrame(rows, columns=['id_num_hash', 'user_id', 'device_id']))
+            if not index.users:
+                index.users, index.devices = chunk.users, chunk.devices
+                continue
+            for mine, theirs in ((index.users, chunk.users), (index.devices, chunk.devices)):
+                for key, values in theirs.items():
+                    for value in (values if isinstance(values, set) else (values,)):
+                        _add(mine, key, value)
+        return index
+
+
+def stolen_filter(id_num_hashes, false_positive_rate=0.001):
+    """BloomFilter holding the given known-stolen identity hashes"""
+    id_num_hashes = list(id_num_hashes)
+    bloom = BloomFilter.for_capacity(len(id_num_hashes), false_positive_rate)
+    for id_num_hash in id_num_hashes:
+        bloom.add(id_num_hash)
+    return bloom
+
+
+def benchmark(n_users=50000, seed=42):
+    """Bulk-build on generator KYC data, screen it again as a stream, and score identity_seen against
+    the generator's injected stolen_ids"""
+    from generate import FraudDataGenerator, seed_everything
+
+    seed_everything(seed)
+    generator = FraudDataGenerator(n_users=n_users, seed=seed)
+    generator.generate_users()
+    generator.generate_devices()
+    kyc = generator.generate_kyc_submissions().to_frame(['id_num_hash', 'user_id', 'device_id', 'created_at'])
+    stolen_hashes = {hashlib.sha256(i.encode()).hexdigest() for i in generator.stolen_ids}
+    # The generator's own stolen list plus synthetic ones, as a realistic pre-filter would hold far more
+    stolen = stolen_filter(list(stolen_hashes) + [hashlib.sha256(f"LEAK{i}".encode()).hexdigest()
+                                                  for i in range(100000)])
+
+    print(f"\n{'=' * 60}")
+    print(f"KYC identity index: {len(kyc):,} submissions")
+    print(f"{'=' * 60}\n")
+    start = time.perf_counter()
+    index = IdentityIndex.from_frame(kyc, stolen)
+    print(f"Bulk build: {time.perf_counter() - start:.2f}s, {len(index):,} identities, "
+          f"{index.reused():,} used by 2+ users | Bloom filter {stolen.nbytes / 1024:.0f}KiB, k={stolen.n_hashes}")
+
+    streamed = IdentityIndex(stolen)
+    records = kyc.sort_values('created_at')[['id_num_hash', 'user_id', 'device_id']].to_dict('records')
+    start = time.perf_counter()
+    signals = pd.DataFrame([streamed.screen(record) for record in records])
+    elapsed = time.perf_counter() - start
+    print(f"screen(): {elapsed / len(records) * 1e6:.1f}µs/submission "
+          f"({len(records) / elapsed:,.0f}/s)")
+
+    is_stolen = np.array([record['id_num_hash'] in stolen_hashes for record in records])
+    seen = signals['identity_seen'].to_numpy()
+    print(f"identity_seen: {seen.sum():,} flagged | precision {is_stolen[seen].mean():.3f} | "
+          f"recall {seen[is_stolen].mean():.3f} (first use of each stolen ID is unseen by definition)")
+    suspect = signals['stolen_suspect'].to_numpy()
+    print(f"stolen_suspect: recall {suspect[is_stolen].mean():.3f} | false positives {suspect[~is_stolen].sum():,} "
+          f"of {(~is_stolen).sum():,}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shared-identity index over kyc_submissions.id_num_hash")
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    benchmark(args.users, args.seed)
@@ -0,0 +1,91 @@
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed
+
+NULL_MARKER = '\\N'
+
+
+def _prepare_for_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """Make a DataFrame COPY-safe: integral float columns (ids with NaN) are written as integers."""
+    converted = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_float_dtype(series.dtype):
+            values = series.to_numpy()
+            present = values[~np.isnan(values)]
+            if present.size and np.all(present == np.floor(present)) and np.all(np.abs(present) < 2 ** 53):
+                converted[col] = series.astype('Int64')
+    return df.assign(**converted) if converted else df
+
+
+def copy_dataframe(cursor, table_name: str, df: pd.DataFrame, metrics=None) -> int:
+    """Stream a DataFrame into table_name with COPY ... FROM STDIN using an in-memory CSV buffer."""
+    if df.empty:
+        return 0
+
+    with timed(metrics, 'csv_encode_seconds', table=table_name):
+        buffer = io.StringIO()
+        _prepare_for_copy(df).to_csv(buffer, index=False, header=False, na_rep=NULL_MARKER)
+        buffer.seek(0)
+
+    columns = ', '.join(df.columns)
+    with timed(metrics, 'db_copy_seconds', table=table_name):
+        cursor.copy_expert(
+            f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+            buffer
+        )
+    if metrics is not None:
+        metrics.inc('rows_loaded_total', len(df), table=table_name)
+    return len(df)
+
+
+class CopyLoader:
+    """COPY-based bulk loader with a commit size independent of the generation batch size."""
+
+    def __init__(self, conn, commit_rows=50000, metrics=None):
+        self.conn = conn
+        self.metrics = metrics
+        self.cursor = conn.cursor()
+        self.commit_rows = commit_rows
+        self.pending_rows = 0
+        self.stats = {}
+
+    def load(self, table_name: str, df: pd.DataFrame) -> int:
+        """COPY a DataFrame into table_name, committing once commit_rows rows are pending."""
+        start = time.perf_counter()
+        rows = copy_dataframe(self.cursor, table_name, df, metrics=self.metrics)
+        self.pending_rows += rows
+        if self.pending_rows >= self.commit_rows:
+            self.commit()
+
+        table_stats = self.stats.setdefault(table_name, {'rows': 0, 'seconds': 0.0})
+        table_stats['rows'] += rows
+        table_stats['seconds'] += time.perf_counter() - start
+        return rows
+
+    def commit(self):
+        """Commit any pending rows."""
+        with timed(self.metrics, 'db_commit_seconds'):
+            self.conn.commit()
+        self.pending_rows = 0
+
+    def rate(self, table_name: str) -> float:
+        """Rows per second loaded into table_name so far."""
+        table_stats = self.stats.get(table_name)
+        if not table_stats or table_stats['seconds'] == 0:
+            return 0.0
+        return table_stats['rows'] / table_stats['seconds']
+
+    def report(self):
+        """Print rows and rows/s per table."""
+        print(f"{'Table':<20} {'Rows':>12} {'Seconds':>10} {'Rows/s':>12}")
+        for table_name, table_stats in self.stats.items():
+            print(f"{table_name:<20} {table_stats['rows']:>12,} {table_stats['seconds']:>10.2f} "
+                  f"{self.rate(table_name):>12,.0f}")
+
+    def close(self):
+        self.cursor.close()
@@ -0,0 +1,282 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'fraudgen_'
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class StackSampler:
+    """Low-overhead sampling profiler for one thread, written as folded stacks.
+
+    Every `interval` seconds a background thread records the target thread's Python stack; write()
+    emits "outer;inner;leaf count" lines, the same format py-spy --format raw produces, readable by
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Metrics:
+    """Counters and timers for a generation/load run.
+
+    Timers are summaries (count, sum, max seconds) and counters are totals, both keyed by name and
+    labels. They can be exposed in Prometheus text format over HTTP (serve), appended to a JSON-lines
+    file (emit) and summarised on stdout (report). profile='cprofile' or 'sample' wraps the run in
+    cProfile or a StackSampler; the output is written to profile_path.
+    """
+
+    def __init__(self, jsonl_path=None, port=None, profile=None, profile_path=None, sample_interval=0.005):
+        self.counters = {}
+        self.timers = {}
+        self.lock = threading.Lock()
+        self.jsonl_path = jsonl_path
+        self.jsonl = open(jsonl_path, 'a', buffering=1) if jsonl_path else None
+        self.profile = profile
+        self.profile_path = profile_path or ('generate.pstats' if profile == 'cprofile' else 'generate.folded')
+        self.sample_interval = sample_interval
+        self.profiler = None
+        self.server = None
+        self.started = time.perf_counter()
+        self.cpu_started = time.process_time()
+        if port is not None:
+            self.serve(port)
+
+    @classmethod
+    def from_env(cls):
+        """Build from FRAUDGEN_METRICS_JSONL, FRAUDGEN_METRICS_PORT and FRAUDGEN_PROFILE (cprofile|sample)"""
+        port = os.environ.get('FRAUDGEN_METRICS_PORT')
+        return cls(jsonl_path=os.environ.get('FRAUDGEN_METRICS_JSONL'), port=int(port) if port else None,
+                   profile=os.environ.get('FRAUDGEN_PROFILE') or None,
+                   profile_path=os.environ.get('FRAUDGEN_PROFILE_PATH'))
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            count, total, peak = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds, max(peak, seconds))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed_iter(self, iterable, name, **labels):
+        """Yield from iterable, timing how long each next() takes (i.e. the producer's time)"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(name, time.perf_counter() - start, **labels)
+            yield item
+
+    def record_batch(self, batch_df):
+        """Count generated transactions and, per rule, the transactions it matched.
+
+        Both generator engines attach {rule code: matching rows} as batch_df.attrs['rule_hits']; a
+        transaction that matches several rules counts once for each of them.
+        """
+        self.inc('transactions_generated_total', len(batch_df))
+        for rule, count in batch_df.attrs.get('rule_hits', {}).items():
+            self.inc('fraud_hits_total', int(count), rule=rule)
+
+    def seconds(self, name, **labels):
+        """Total seconds recorded by a timer, summed over every label set when labels are omitted"""
+        with self.lock:
+            if labels:
+                return self.timers.get(_key(name, labels), (0, 0.0, 0.0))[1]
+            return sum(total for (timer, _), (_, total, _) in self.timers.items() if timer == name)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'wall_seconds': round(time.perf_counter() - self.started, 3),
+                'cpu_seconds': round(time.process_time() - self.cpu_started, 3),
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in self.counters.items()],
+                'timers': [{'name': name, 'labels': dict(labels), 'count': count, 'sum': round(total, 6),
+                            'max': round(peak, 6)}
+                           for (name, labels), (count, total, peak) in self.timers.items()],
+            }
+
+    def prometheus(self):
+        """Prometheus text exposition of every counter and timer"""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {PREFIX}wall_seconds gauge", f"{PREFIX}wall_seconds {snapshot['wall_seconds']}",
+                 f"# TYPE {PREFIX}cpu_seconds gauge", f"{PREFIX}cpu_seconds {snapshot['cpu_seconds']}"]
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines += [f"{PREFIX}{name}{_label_text(labels)} {value}"
+                          for (counter, labels), value in self.counters.items() if counter == name]
+            for name in sorted({name for name, _ in self.timers}):
+                lines.append(f"# TYPE {PREFIX}{name} summary")
+                for (timer, labels), (count, total, _) in self.timers.items():
+                    if timer == name:
+                        lines.append(f"{PREFIX}{name}_sum{_label_text(labels)} {total:.6f}")
+                        lines.append(f"{PREFIX}{name}_count{_label_text(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port):
+        """Serve /metrics in Prometheus text format from a daemon thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('', port), Handler)
+        threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True).start()
+        print(f"📡 Metrics at http://localhost:{self.server.server_port}/metrics")
+
+    def emit(self, event, **fields):
+        """Append one JSON line (event, fields and the current snapshot) to jsonl_path"""
+        if self.jsonl is None:
+            return
+        line = {'ts': datetime.now(timezone.utc).isoformat(), 'event': event, **fields, **self.snapshot()}
+        self.jsonl.write(json.dumps(line, default=str) + '\n')
+
+    @contextmanager
+    def profiling(self):
+        """Run the body under the configured profiler (no-op when profile is None)"""
+        if self.profile == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profile == 'sample':
+            self.profiler = StackSampler(self.sample_interval)
+            self.profiler.start()
+        elif self.profile:
+            raise ValueError(f"Unknown profile mode {self.profile!r} (expected 'cprofile' or 'sample')")
+        else:
+            yield
+            return
+        print(f"🔬 Profiling ({self.profile}) pid {os.getpid()} -> {self.profile_path}")
+        try:
+            yield
+        finally:
+            if self.profile == 'cprofile':
+                self.profiler.disable()
+                self.profiler.dump_stats(self.profile_path)
+                out = io.StringIO()
+                pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(15)
+                print(out.getvalue())
+            else:
+                self.profiler.stop()
+                self.profiler.write(self.profile_path)
+
+    def report(self):
+        """Print where the time went: generation vs DataFrame conversion vs DB round trips and commits (or
+        file sink writes); stages that recorded nothing are left out"""
+        snapshot = self.snapshot()
+        wall = max(snapshot['wall_seconds'], 1e-9)
+        print(f"{'Stage':<28} {'Seconds':>10} {'Share':>8}")
+        with self.lock:
+            recorded = {name for name, _ in self.timers}
+        for label, name in [('generate (incl. DataFrames)', 'generate_seconds'),
+                            ('  DataFrame conversion', 'dataframe_seconds'),
+                            ('CSV encoding', 'csv_encode_seconds'),
+                            ('DB COPY round trips', 'db_copy_seconds'),
+                            ('DB commits', 'db_commit_seconds'),
+                            ('file sink writes', 'sink_write_seconds')]:
+            if name not in recorded:
+                continue
+            seconds = self.seconds(name)
+            print(f"{label:<28} {seconds:>10.2f} {100 * seconds / wall:>7.1f}%")
+        print(f"{'wall / process CPU':<28} {snapshot['wall_seconds']:>10.2f} {snapshot['cpu_seconds']:>8.2f}")
+        cpu_share = snapshot['cpu_seconds'] / wall
+        print(f"→ {'CPU-bound' if cpu_share > 0.7 else 'I/O-bound'} (process CPU {100 * cpu_share:.0f}% of wall)")
+
+        hits = {dict(labels)['rule']: value for (name, labels), value in self.counters.items()
+                if name == 'fraud_hits_total'}
+        if hits:
+            print("\nFraud hits per rule (every matching rule counts):")
+            for rule, count in sorted(hits.items(), key=lambda item: -item[1]):
+                print(f"   {rule:<20} {count:>10,}")
+
+    def close(self):
+        if self.jsonl is not None:
+            self.emit('summary')
+            self.jsonl.close()
+            self.jsonl = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def timed(metrics, name, **labels):
+    """metrics.timer(...) or a no-op context when metrics is None"""
+    return metrics.timer(name, **labels) if metrics is not None else nullcontext()
@@ -0,0 +1,140 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+from generate import HOUR_ADVANCE_P
+
+# Per-process state, populated once by _init_worker
+_WORKER = {}
+
+
+def shard_plan(start_date, end_date, n_transactions, n_shards, first_trx_id=1, block_size=1):
+    """Split the trx_id range into n_shards contiguous quotas, each starting at the hour an unsharded run
+    would reach after the rows before it (the clock moves on HOUR_ADVANCE_P hours per row on average).
+
+    Quotas are whole multiples of block_size. The columnar engine only looks back at account history
+    within its block (velocity, amount spike, turnaround), so shards that start on block boundaries
+    see the same history as an unsharded run; a smaller trailing quota or fewer shards may result.
+    Every shard runs until its quota is filled or end_date is reached, so sharding keeps the time
+    distribution of a single-process run; shards that would start after end_date are dropped, as an
+    unsharded run stops there too. Returns a list of
+    (shard, shard_start, shard_end, first_trx_id, last_trx_id) tuples.
+    """
+    start_date = pd.Timestamp(start_date)
+    end_date = pd.Timestamp(end_date)
+    n_rows = n_transactions - first_trx_id + 1
+    n_shards = max(1, min(n_shards, n_rows))
+    quota = -(-n_rows // n_shards)
+    quota = -(-quota // block_size) * block_size
+
+    plan = []
+    for shard in range(n_shards):
+        shard_first = first_trx_id + shard * quota
+        shard_last = min(shard_first + quota - 1, n_transactions)
+        shard_start = start_date + timedelta(hours=int((shard_first - first_trx_id) * HOUR_ADVANCE_P))
+        if shard_first <= shard_last and shard_start <= end_date:
+            plan.append((shard, shard_start, end_date, shard_first, shard_last))
+    return plan
+
+
+def _init_worker(generator, seed, queues, stop):
+    """Build the shared per-user context once per worker process.
+
+    Profiles are drawn from a Generator seeded with `seed` alone, so every worker sees the same population.
+    """
+    faker = Faker('de_DE')
+    faker.seed_instance(seed)
+    _WORKER['generator'] = generator
+    _WORKER['ctx'] = generator._columnar_context(np.random.default_rng(seed), faker=faker)
+    _WORKER['queues'] = queues
+    _WORKER['stop'] = stop
+
+
+def _generate_shard(shard, shard_start, shard_end, first_trx_id, last_trx_id, seed_seq, slot):
+    """Generate one shard with its own numpy Generator and Faker instance, putting each block on the
+    shard's queue (queues[slot]) as soon as it is ready and None when the shard is done."""
+    generator = _WORKER['generator']
+    blocks = _WORKER['queues'][slot]
+    rng = np.random.default_rng(seed_seq)
+    faker = Faker('de_DE')
+    faker.seed_instance(int(seed_seq.generate_state(1)[0]))
+    ctx = dict(_WORKER['ctx'], faker_pool=generator._faker_pool(faker, rng))
+
+    try:
+        for block in generator.generate_transactions_columnar(
+            n_transactions=last_trx_id,
+            start_trx_id=first_trx_id,
+            resume_date=shard_start,
+            end_date=shard_end,
+            rng=rng,
+            ctx=ctx
+        ):
+            if _WORKER['stop'].is_set():
+                break
+            blocks.put(block)
+    finally:
+        blocks.put(None)
+    return shard
+
+
+def _check_workers(futures):
+    """Raise the error of a failed shard (a worker process that died sends no end-of-shard marker)"""
+    for future in futures:
+        if future.done() and not future.cancelled() and future.exception() is not None:
+            raise future.exception()
+
+
+def generate_sharded(generator, n_transactions=5000000, n_shards=8, max_workers=None, seed=None):
+    """Generate transactions in worker processes, one shard per task, yielding blocks in trx_id order.
+
+    Each shard streams its columnar blocks through its own queue of at most 2 blocks, and the shards
+    are read in plan order: a worker that gets ahead of the reader waits on its full queue, so memory
+    stays at a few blocks per worker however large the shards are. Tasks start in plan order, so the
+    shard being read is always running or done. The output is reproducible for a given (seed, n_shards,
+    generator.columnar_block_size): shard k always uses the k-th child of SeedSequence(seed) (default:
+    generator.seed) regardless of max_workers.
+    """
+    seed = generator.seed if seed is None else seed
+    max_workers = max_workers or os.cpu_count() or 1
+    plan = shard_plan(generator.start_date, generator.end_date, n_transactions, n_shards,
+                      block_size=generator.columnar_block_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_shards)
+    mp_context = multiprocessing.get_context()
+    queues, stop = [mp_context.Queue(maxsize=2) for _ in plan], mp_context.Event()
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(generator, seed, queues, stop)) as executor:
+        futures = [executor.submit(_generate_shard, *task, seeds[task[0]], slot) for slot, task in enumerate(plan)]
+        try:
+            for blocks in queues:
+                while True:
+                    try:
+                        block = blocks.get(timeout=1)
+                    except queue.Empty:
+                        _check_workers(futures)
+                        continue
+                    if block is None:
+                        break
+                    if not block.empty:
+                        yield block
+            for future in futures:
+                future.result()
+        finally:
+            # Stop early (consumer closed us or a shard failed): drain so no worker blocks on a full queue
+            stop.set()
+            for future in futures:
+                future.cancel()
+            while not all(future.done() for future in futures):
+                for blocks in queues:
+                    try:
+                        blocks.get_nowait()
+                    except queue.Empty:
+                        pass
+                time.sleep(0.01)
@@ -0,0 +1,139 @@
+import os
+import re
+
+import pandas as pd
+
+from loader import CopyLoader
+
+PARTITIONED_TABLE_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables',
+                                     'transactions_partitioned.sql')
+PARTITION_BY = ') PARTITION BY RANGE (created_at);'
+
+
+def partition_name(month, table_name='transactions'):
+    """Name of the monthly partition holding month (any timestamp inside it)"""
+    month = pd.Timestamp(month)
+    return f"{table_name}_{month.year:04d}_{month.month:02d}"
+
+
+def month_bounds(month):
+    """[start, end) of the calendar month containing month, as naive timestamps"""
+    start = pd.Timestamp(month).tz_localize(None).to_period('M').to_timestamp()
+    return start, start + pd.offsets.MonthBegin(1)
+
+
+def create_transactions_table(cursor, hypertable=False, chunk_interval='1 month'):
+    """Create `transactions` from tables/transactions_partitioned.sql.
+
+    With hypertable=True the same table is created unpartitioned and handed to TimescaleDB, which then
+    creates chunks (of chunk_interval) on insert instead of ensure_partitions.
+    """
+    with open(PARTITIONED_TABLE_SQL) as f:
+        ddl = f.read()
+    if hypertable:
+        cursor.execute(ddl.replace(PARTITION_BY, ');'))
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS timescaledb")
+        cursor.execute("SELECT create_hypertable('transactions', 'created_at', "
+                       "chunk_time_interval => %s::interval, if_not_exists => TRUE)", (chunk_interval,))
+    else:
+        cursor.execute(ddl)
+
+
+def is_hypertable(cursor, table_name='transactions'):
+    """Whether table_name is a TimescaleDB hypertable (False when TimescaleDB is not installed)"""
+    cursor.execute("SELECT to_regclass('timescaledb_information.hypertables') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return False
+    cursor.execute("SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = %s", (table_name,))
+    return cursor.fetchone() is not None
+
+
+def existing_partitions(cursor, table_name='transactions'):
+    """Names of the partitions currently attached to table_name"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = %s
+    """, (table_name,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_partitions(cursor, start, end, table_name='transactions', known=None):
+    """Create every missing monthly partition covering [start, end]; returns the names created"""
+    known = existing_partitions(cursor, table_name) if known is None else known
+    created = []
+    month, _ = month_bounds(start)
+    last, _ = month_bounds(end)
+    while month <= last:
+        name = partition_name(month, table_name)
+        if name not in known:
+            lower, upper = month_bounds(month)
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table_name} "
+                           f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')")
+            known.add(name)
+            created.append(name)
+        month += pd.offsets.MonthBegin(1)
+    return created
+
+
+def drop_partitions_before(cursor, cutoff, table_name='transactions', hypertable=None):
+    """Drop whole months of data older than cutoff without scanning or deleting rows.
+
+    Only partitions that end on or before cutoff are dropped; returns their names (or the chunk
+    names TimescaleDB reports). hypertable defaults to is_hypertable(cursor, table_name).
+    """
+    if hypertable is None:
+        hypertable = is_hypertable(cursor, table_name)
+    if hypertable:
+        cursor.execute("SELECT drop_chunks(%s, older_than => %s::timestamptz)", (table_name, pd.Timestamp(cutoff)))
+        return [row[0] for row in cursor.fetchall()]
+
+    pattern = re.compile(rf"^{re.escape(table_name)}_(\d{{4}})_(\d{{2}})$")
+    cutoff = pd.Timestamp(cutoff).tz_localize(None)
+    dropped = []
+    for name in sorted(existing_partitions(cursor, table_name)):
+        match = pattern.match(name)
+        if not match:
+            continue
+        _, upper = month_bounds(pd.Timestamp(year=int(match[1]), month=int(match[2]), day=1))
+        if upper <= cutoff:
+            cursor.execute(f"ALTER TABLE {table_name} DETACH PARTITION {name}")
+            cursor.execute(f"DROP TABLE {name}")
+            dropped.append(name)
+    return dropped
+
+
+class PartitionedLoader(CopyLoader):
+    """CopyLoader that COPYs transaction batches straight into their monthly partitions.
+
+    Rows are grouped by the month of created_at (interpreted in the session time zone, as Postgres
+    does for the partition bounds); missing partitions are created on first use. Other tables are
+    loaded as usual. A TimescaleDB hypertable creates its own chunks, so batches are COPYed into it
+    as they are.
+    """
+
+    def __init__(self, conn, commit_rows=50000, table_name='transactions', metrics=None):
+        super().__init__(conn, commit_rows=commit_rows, metrics=metrics)
+        self.table_name = table_name
+        self.hypertable = is_hypertable(self.cursor, table_name)
+        self.partitions = set() if self.hypertable else existing_partitions(self.cursor, table_name)
+        self.cursor.execute("SHOW TIME ZONE")
+        self.timezone = self.cursor.fetchone()[0]
+
+    def load(self, table_name, df):
+        if table_name != self.table_name or df.empty or self.hypertable:
+            return super().load(table_name, df)
+
+        created_at = pd.to_datetime(df['created_at'])
+        if created_at.dt.tz is not None:
+            created_at = created_at.dt.tz_convert(self.timezone).dt.tz_localize(None)
+        months = created_at.dt.to_period('M')
+
+        rows = 0
+        for month, part in df.groupby(months.to_numpy(), sort=True):
+            start, _ = month_bounds(month.to_timestamp())
+            ensure_partitions(self.cursor, start, start, self.table_name, known=self.partitions)
+            rows += super().load(partition_name(start, self.table_name), part)
+        return rows
@@ -0,0 +1,169 @@
+import os
+import shutil
+from functools import lru_cache
+
+import pandas as pd
+
+from loader import _prepare_for_copy
+
+
+@lru_cache(maxsize=None)
+def transactions_schema():
+    """Arrow schema of the transactions dataset (pyarrow is imported lazily; CSV runs don't need it)"""
+    import pyarrow as pa
+    return pa.schema([
+        ('trx_id', pa.int64()),
+        ('source_account_id', pa.int64()),
+        ('beneficiary_account_id', pa.int64()),
+        ('beneficiary_bank', pa.string()),
+        ('trx_type', pa.string()),
+        ('amount', pa.float64()),
+        ('currency', pa.string()),
+        ('channel', pa.string()),
+        ('status', pa.string()),
+        ('narration', pa.string()),
+        ('reference_id', pa.string()),
+        ('device_ip', pa.string()),
+        ('geo_lat', pa.float64()),
+        ('geo_long', pa.float64()),
+        ('country', pa.string()),
+        ('auth_result', pa.bool_()),
+        ('created_at', pa.timestamp('us')),
+        ('processed_at', pa.timestamp('us')),
+        ('is_fraud', pa.bool_()),
+        ('reason', pa.string()),
+    ])
+
+
+class ParquetSink:
+    """Offline sink writing generated tables as Parquet datasets under out_dir.
+
+    Entity tables are written as one file per table; transactions are streamed into a hive-partitioned
+    dataset (transactions/month=YYYY-MM/part-N.parquet) through one ParquetWriter per open month,
+    buffering rows until a full row group is available. A run replaces the transactions of any earlier
+    run in out_dir (entity tables are overwritten too), so the two always match.
+    """
+
+    def __init__(self, out_dir, row_group_size=250000, compression='zstd'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.pq = pq
+        self.out_dir = out_dir
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.writers = {}
+        self.buffers = {}
+        self.parts = {}
+        self.rows = {}
+        shutil.rmtree(os.path.join(out_dir, 'transactions'), ignore_errors=True)
+        os.makedirs(out_dir, exist_ok=True)
+
+    def write_table(self, table_name, frames):
+        """Write a whole entity table (users, accounts, devices, ...) as a single-file dataset.
+
+        frames is a DataFrame or an iterable of DataFrames (e.g. EntityTable.iter_frames()), streamed
+        through one ParquetWriter with the schema of the first frame.
+        """
+        table_dir = os.path.join(self.out_dir, table_name)
+        os.makedirs(table_dir, exist_ok=True)
+        writer = None
+        rows = 0
+        try:
+            for df in [frames] if isinstance(frames, pd.DataFrame) else frames:
+                if writer is None:
+                    schema = self.pa.Schema.from_pandas(df, preserve_index=False)
+                    # An all-NULL text column in the first frame would otherwise be typed null
+                    schema = self.pa.schema([field.with_type(self.pa.string()) if field.type == self.pa.null()
+                                             else field for field in schema], metadata=schema.metadata)
+                    writer = self.pq.ParquetWriter(os.path.join(table_dir, 'part-0.parquet'), schema,
+                                                   compression=self.compression)
+                writer.write_table(self.pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False),
+                                   row_group_size=self.row_group_size)
+                rows += len(df)
+        finally:
+            if writer is not None:
+                writer.close()
+        self.rows[table_name] = self.rows.get(table_name, 0) + rows
+        return rows
+
+    def write_transactions(self, batch_df):
+        """Route a batch of transactions to its monthly partitions."""
+        if batch_df.empty:
+            return 0
+        created_at = pd.to_datetime(batch_df['created_at'])
+        months = created_at.dt.strftime('%Y-%m')
+        for month, part in batch_df.groupby(months.to_numpy(), sort=True):
+            buffer = self.buffers.setdefault(month, [])
+            buffer.append(part)
+            if sum(len(p) for p in buffer) >= self.row_group_size:
+                self._flush(month)
+
+        # Close months older than this batch to bound the number of open writers. Sharded runs can still
+        # revisit a closed month; _flush then opens the next part-N file for it instead of overwriting
+        # the earlier ones
+        oldest = months.min()
+        for month in sorted(m for m in set(self.writers) | set(self.buffers) if m < oldest):
+            self._close(month)
+
+        self.rows['transactions'] = self.rows.get('transactions', 0) + len(batch_df)
+        return len(batch_df)
+
+    def _flush(self, month):
+        buffer = self.buffers.pop(month, [])
+        if not buffer:
+            return
+        writer = self.writers.get(month)
+        if writer is None:
+            part_dir = os.path.join(self.out_dir, 'transactions', f'month={month}')
+            os.makedirs(part_dir, exist_ok=True)
+            part = self.parts[month] = self.parts.get(month, -1) + 1
+            writer = self.writers[month] = self.pq.ParquetWriter(
+                os.path.join(part_dir, f'part-{part}.parquet'), transactions_schema(), compression=self.compression)
+        df = pd.concat(buffer, ignore_index=True)
+        writer.write_table(self.pa.Table.from_pandas(df, schema=transactions_schema(), preserve_index=False),
+                           row_group_size=self.row_group_size)
+
+    def _close(self, month):
+        self._flush(month)
+        writer = self.writers.pop(month, None)
+        if writer is not None:
+            writer.close()
+
+    def close(self):
+        """Flush buffered rows and close every open partition writer."""
+        for month in sorted(set(self.buffers) | set(self.writers)):
+            self._close(month)
+
+
+class CsvSink:
+    """Offline sink writing each generated table as one CSV file (with header) under out_dir.
+
+    Transactions are appended batch by batch to transactions.csv. Integral id columns are written
+    as integers and NULLs as empty fields, so the files load with COPY ... WITH (FORMAT csv, HEADER).
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.rows = {}
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _append(self, table_name, df):
+        path = os.path.join(self.out_dir, f'{table_name}.csv')
+        first = table_name not in self.rows
+        _prepare_for_copy(df).to_csv(path, mode='w' if first else 'a', header=first, index=False)
+        self.rows[table_name] = self.rows.get(table_name, 0) + len(df)
+        return len(df)
+
+    def write_table(self, table_name, frames):
+        """Write a whole entity table (users, accounts, devices, ...) from a DataFrame or an iterable of them."""
+        return sum(self._append(table_name, df) for df in ([frames] if isinstance(frames, pd.DataFrame) else frames))
+
+    def write_transactions(self, batch_df):
+        """Append a batch of transactions to transactions.csv."""
+        if batch_df.empty:
+            return 0
+        return self._append('transactions', batch_df)
+
+    def close(self):
+        pass
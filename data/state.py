@@ -0,0 +1,100 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import timedelta
+import math
+
+
+class AccountState:
+    """Rolling per-account state: recent transaction times/types plus Welford amount statistics."""
+
+    __slots__ = ('times', 'types', 'count', 'mean', 'm2', 'last_trx_type', 'last_seen')
+
+    def __init__(self):
+        self.times = []  # created_at of recent transactions, kept sorted
+        self.types = []  # trx_type aligned with times
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.last_trx_type = None
+        self.last_seen = None
+
+    def prune(self, cutoff):
+        """Drop window entries at or before cutoff."""
+        drop = bisect_right(self.times, cutoff)
+        if drop:
+            del self.times[:drop]
+            del self.types[:drop]
+
+    def recent(self, ts, window):
+        """(times, types) within `window` before ts; later entries are included too, as in the generator."""
+        start = bisect_right(self.times, ts - window)
+        return self.times[start:], self.types[start:]
+
+    @property
+    def std(self):
+        """Population standard deviation of all amounts seen so far."""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+    def z_score(self, amount):
+        """Z-score of amount against the account's history, using std + 1 as in the generator rules."""
+        return (amount - self.mean) / (self.std + 1)
+
+    def update(self, ts, amount, trx_type):
+        """Record a transaction in O(log window) time."""
+        i = bisect_right(self.times, ts)
+        self.times.insert(i, ts)
+        self.types.insert(i, trx_type)
+        self.count += 1
+        delta = amount - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (amount - self.mean)
+        self.last_trx_type = trx_type
+        self.last_seen = ts if self.last_seen is None else max(self.last_seen, ts)
+
+
+class AccountStateStore:
+    """Per-account rolling state with LRU eviction of idle accounts.
+
+    `watermark` is a lower bound on the timestamps of future events (the generator's current_date, or
+    the event time itself for an ordered stream). Window entries older than watermark - window can
+    never be counted again and are pruned; accounts idle for longer than `idle_after` or beyond
+    `max_accounts` are evicted.
+    """
+
+    def __init__(self, window=timedelta(hours=1), idle_after=timedelta(days=30), max_accounts=1000000):
+        self.window = window
+        self.idle_after = idle_after
+        self.max_accounts = max_accounts
+        self.watermark = None
+        self.accounts = OrderedDict()
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def get(self, account_id):
+        """Return (creating if needed) the state of account_id, marking it most recently used."""
+        state = self.accounts.get(account_id)
+        if state is None:
+            state = self.accounts[account_id] = AccountState()
+        else:
+            self.accounts.move_to_end(account_id)
+        if self.watermark is not None:
+            state.prune(self.watermark - self.window)
+        return state
+
+    def update(self, account_id, ts, amount, trx_type):
+        """Record a transaction for account_id and evict idle accounts."""
+        self.get(account_id).update(ts, amount, trx_type)
+        self._evict()
+
+    def _evict(self):
+        while len(self.accounts) > self.max_accounts:
+            self.accounts.popitem(last=False)
+        if self.watermark is None:
+            return
+        idle_cutoff = self.watermark - self.idle_after
+        while self.accounts:
+            oldest = next(iter(self.accounts.values()))
+            if oldest.last_seen is None or oldest.last_seen >= idle_cutoff:
+                break
+            self.accounts.popitem(last=False)
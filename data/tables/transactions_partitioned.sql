@@ -0,0 +1,30 @@
+-- Monthly range-partitioned variant of transactions.sql; partitions are created by partitions.ensure_partitions,
+-- e.g. CREATE TABLE transactions_2024_01 PARTITION OF transactions FOR VALUES FROM ('2024-01-01') TO ('2024-02-01').
+-- Unique constraints on a partitioned table must include created_at, so fraud_label cannot REFERENCES
+-- transactions(trx_id) against this table. For a TimescaleDB hypertable use the same DDL without the
+-- PARTITION BY clause (partitions.create_transactions_table(cursor, hypertable=True)).
+CREATE TABLE transactions(
+	trx_id BIGINT NOT NULL,
+	source_account_id BIGINT NOT NULL REFERENCES accounts(account_id),
+	beneficiary_account_id  BIGINT REFERENCES accounts(account_id),
+	beneficiary_bank VARCHAR(100),
+	trx_type VARCHAR(20) NOT NULL, -- transfer, deposit, withdrawal
+	amount NUMERIC(20,2) NOT NULL,
+	currency CHAR(3) NOT NULL DEFAULT 'NGN',
+	channel VARCHAR(50), -- mobile, web, ...
+	status VARCHAR(20) NOT NULL DEFAULT 'pending',
+	narration TEXT,
+	reference_id TEXT,
+	device_ip INET,
+	geo_lat DOUBLE PRECISION NOT NULL,
+	geo_long DOUBLE PRECISION NOT NULL,
+	country CHAR(5) DEFAULT 'NG',
+	auth_result BOOLEAN DEFAULT 'FALSE',
+	created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+	processed_at TIMESTAMPTZ,
+	is_fraud BOOLEAN DEFAULT FALSE,
+	reason TEXT,
+	PRIMARY KEY (trx_id, created_at),
+	UNIQUE (reference_id, created_at)
+) PARTITION BY RANGE (created_at);
+CREATE INDEX ON transactions (source_account_id, created_at);
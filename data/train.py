@@ -0,0 +1,309 @@
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from metrics import peak_rss_mb
+
+NON_FEATURES = ['trx_id', 'created_at', 'is_fraud']
+BACKENDS = ['xgboost', 'lightgbm', 'sklearn']
+
+
+def month_paths(dataset_dir):
+    """(month, path) of every dataset.py partition, oldest first"""
+    paths = sorted(glob.glob(os.path.join(dataset_dir, 'month=*', '*.parquet')))
+    return [(os.path.basename(os.path.dirname(path)).split('=', 1)[1], path) for path in paths]
+
+
+def pick_backend(name='auto'):
+    """The requested backend, or the first importable one of xgboost, lightgbm, scikit-learn"""
+    if name != 'auto':
+        return name
+    for backend in BACKENDS:
+        try:
+            __import__(backend)
+            return backend
+        except ImportError:
+            continue
+    raise ImportError("Training needs xgboost, lightgbm or scikit-learn")
+
+
+class FeatureEncoder:
+    """Column order and category vocabularies shared by every chunk (and saved with the model)"""
+
+    def __init__(self, numeric, categorical):
+        self.numeric = numeric
+        self.categorical = categorical
+        self.indexes = {column: pd.Index(vocabulary) for column, vocabulary in categorical.items()}
+
+    @property
+    def columns(self):
+        return self.numeric + list(self.categorical)
+
+    @classmethod
+    def scan(cls, paths):
+        """One cheap pass over the schemas and categorical columns of every partition"""
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(paths[0])
+        numeric, categorical = [], {}
+        for field in schema:
+            if field.name in NON_FEATURES:
+                continue
+            if str(field.type).startswith('dictionary') or str(field.type) == 'string':
+                categorical[field.name] = set()
+            else:
+                numeric.append(field.name)
+        for path in paths:
+            table = pq.read_table(path, columns=list(categorical)).to_pandas()
+            for column in categorical:
+                categorical[column].update(table[column].dropna().astype(str).unique())
+        return cls(numeric, {column: sorted(values) for column, values in categorical.items()})
+
+    def transform(self, df):
+        """float32 matrix: numeric columns as-is, categoricals as vocabulary codes (unknown/missing -> NaN)"""
+        X = np.empty((len(df), len(self.columns)), dtype=np.float32)
+        for i, column in enumerate(self.numeric):
+            X[:, i] = df[column].to_numpy(dtype=np.float32, na_value=np.nan)
+        for i, column in enumerate(self.categorical, start=len(self.numeric)):
+            values = df[column].to_numpy(dtype=object)
+            codes = self.indexes[column].get_indexer(values.astype(str))
+            X[:, i] = np.where((codes < 0) | pd.isna(values), np.nan, codes)
+        return X
+
+    def to_dict(self):
+        return {'numeric': self.numeric, 'categorical': self.categorical}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['numeric'], data['categorical'])
+
+
+def downsample(y, negative_rate, rng):
+    """Keep every positive and a negative_rate share of negatives; weights 1/negative_rate undo the bias"""
+    keep = y | (rng.random(len(y)) < negative_rate)
+    weight = np.where(y[keep], 1.0, 1.0 / negative_rate).astype(np.float32)
+    return keep, weight
+
+
+def spool(paths, encoder, spool_dir, negative_rate=0.1, seed=42):
+    """Stream the training months into an on-disk float32 matrix, downsampling negatives month by month.
+
+    Only one month is in memory at a time; X comes back memory-mapped, y and w are small.
+    """
+    import pyarrow.parquet as pq
+
+    rng = np.random.default_rng(seed)
+    columns = encoder.columns + ['is_fraud']
+    path_x = os.path.join(spool_dir, 'X.f32')
+    ys, ws = [], []
+    with open(path_x, 'wb') as f:
+        for path in paths:
+            df = pq.read_table(path, columns=columns).to_pandas()
+            y = df['is_fraud'].to_numpy(dtype=bool)
+            keep, weight = downsample(y, negative_rate, rng)
+            f.write(encoder.transform(df[keep]).tobytes())
+            ys.append(y[keep])
+            ws.append(weight)
+    y, w = np.concatenate(ys), np.concatenate(ws)
+    X = np.memmap(path_x, dtype=np.float32, mode='r', shape=(len(y), len(encoder.columns)))
+    return X, y, w
+
+
+def _train_xgboost(X, y, w, params, rounds, spool_dir, batch_rows):
+    import xgboost
+
+    class SpoolIter(xgboost.DataIter):
+        """Feeds the memory-mapped spool to XGBoost in batches (external-memory DMatrix)"""
+
+        def __init__(self):
+            self.start = 0
+            super().__init__(cache_prefix=os.path.join(spool_dir, 'xgb-cache'))
+
+        def next(self, input_data):
+            if self.start >= len(y):
+                return 0
+            end = self.start + batch_rows
+            input_data(data=np.asarray(X[self.start:end]), label=y[self.start:end], weight=w[self.start:end])
+            self.start = end
+            return 1
+
+        def reset(self):
+            self.start = 0
+
+    dtrain = xgboost.DMatrix(SpoolIter(), missing=np.nan)
+    booster = xgboost.train({'objective': 'binary:logistic', 'tree_method': 'hist', 'eval_metric': 'aucpr',
+                             'max_depth': params['max_depth'], 'eta': params['learning_rate'],
+                             'max_bin': params['max_bins']}, dtrain, num_boost_round=rounds)
+    return booster, lambda M: booster.predict(xgboost.DMatrix(M, missing=np.nan))
+
+
+def _train_lightgbm(X, y, w, params, rounds, spool_dir, batch_rows):
+    import lightgbm
+
+    class SpoolSequence(lightgbm.Sequence):
+        """Random-access view of the spool; LightGBM bins it batch_size rows at a time"""
+
+        def __init__(self):
+            self.batch_size = batch_rows
+
+        def __getitem__(self, index):
+            return np.asarray(X[index])
+
+        def __len__(self):
+            return len(X)
+
+    dtrain = lightgbm.Dataset(SpoolSequence(), label=y, weight=w, params={'max_bin': params['max_bins']})
+    booster = lightgbm.train({'objective': 'binary', 'metric': 'average_precision', 'verbose': -1,
+                              'max_depth': params['max_depth'], 'learning_rate': params['learning_rate'],
+                              'num_leaves': 2 ** params['max_depth'] - 1}, dtrain, num_boost_round=rounds)
+    return booster, booster.predict
+
+
+def _train_sklearn(X, y, w, params, rounds, spool_dir, batch_rows):
+    from sklearn.ensemble import HistGradientBoostingClassifier
+
+    # Not out-of-core: it bins the whole (already downsampled) spool in memory
+    model = HistGradientBoostingClassifier(max_iter=rounds, learning_rate=params['learning_rate'],
+                                           max_depth=params['max_depth'], max_bins=min(params['max_bins'], 255),
+                                           early_stopping=False, random_state=params['seed'])
+    model.fit(X, y, sample_weight=w)
+    return model, lambda M: model.predict_proba(M)[:, 1]
+
+
+TRAINERS = {'xgboost': _train_xgboost, 'lightgbm': _train_lightgbm, 'sklearn': _train_sklearn}
+
+
+def save_model(model, backend, encoder, model_dir, meta):
+    os.makedirs(model_dir, exist_ok=True)
+    if backend == 'xgboost':
+        model.save_model(os.path.join(model_dir, 'model.json'))
+    elif backend == 'lightgbm':
+        model.save_model(os.path.join(model_dir, 'model.txt'))
+    else:
+        import joblib
+        joblib.dump(model, os.path.join(model_dir, 'model.joblib'))
+    with open(os.path.join(model_dir, 'meta.json'), 'w') as f:
+        json.dump({'backend': backend, 'features': encoder.to_dict(), **meta}, f, indent=2)
+
+
+def load_model(model_dir):
+    """(model, FeatureEncoder, meta) as written by save_model"""
+    with open(os.path.join(model_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    backend = meta['backend']
+    if backend == 'xgboost':
+        import xgboost
+        model = xgboost.Booster()
+        model.load_model(os.path.join(model_dir, 'model.json'))
+    elif backend == 'lightgbm':
+        import lightgbm
+        model = lightgbm.Booster(model_file=os.path.join(model_dir, 'model.txt'))
+    else:
+        import joblib
+        model = joblib.load(os.path.join(model_dir, 'model.joblib'))
+    return model, FeatureEncoder.from_dict(meta['features']), meta
+
+
+def evaluate(predict, paths, encoder):
+    """Stream the validation months (not downsampled) through predict; returns metrics"""
+    import pyarrow.parquet as pq
+    from sklearn.metrics import average_precision_score, roc_auc_score
+
+    ys, ps = [], []
+    for path in paths:
+        df = pq.read_table(path, columns=encoder.columns + ['is_fraud']).to_pandas()
+        ys.append(df['is_fraud'].to_numpy(dtype=bool))
+        ps.append(np.asarray(predict(encoder.transform(df)), dtype=np.float64))
+    y, p = np.concatenate(ys), np.concatenate(ps)
+    return {'rows': int(len(y)), 'fraud_rate': float(y.mean()), 'mean_score': float(p.mean()),
+            'roc_auc': float(roc_auc_score(y, p)) if 0 < y.sum() < len(y) else None,
+            'pr_auc': float(average_precision_score(y, p)) if y.any() else None}
+
+
+def train(dataset_dir='dataset', model_dir='models/fraud', backend='auto', negative_rate=0.1, valid_months=2,
+          rounds=200, learning_rate=0.1, max_depth=6, max_bins=256, batch_rows=100000, seed=42):
+    """Out-of-time training on dataset.py output: earlier months train, the last valid_months validate"""
+    backend = pick_backend(backend)
+    months = month_paths(dataset_dir)
+    if len(months) <= valid_months:
+        raise ValueError(f"Need more than {valid_months} months of data in {dataset_dir}, found {len(months)}")
+    train_months, valid = months[:-valid_months], months[-valid_months:]
+
+    print(f"\n{'=' * 60}")
+    print(f"Training {backend} on {train_months[0][0]}..{train_months[-1][0]}, "
+          f"validating on {valid[0][0]}..{valid[-1][0]}")
+    print(f"Negative downsampling rate {negative_rate} (weights {1 / negative_rate:g})")
+    print(f"{'=' * 60}\n")
+
+    encoder = FeatureEncoder.scan([path for _, path in months])
+    params = {'learning_rate': learning_rate, 'max_depth': max_depth, 'max_bins': max_bins, 'seed': seed}
+    with tempfile.TemporaryDirectory(prefix='spool-') as spool_dir:
+        start = time.perf_counter()
+        X, y, w = spool([path for _, path in train_months], encoder, spool_dir, negative_rate, seed)
+        spool_seconds = time.perf_counter() - start
+        print(f"✓ Spooled {len(y):,} rows ({y.mean():.2%} fraud after downsampling) x {X.shape[1]} features "
+              f"in {spool_seconds:.1f}s | peak RSS {peak_rss_mb():,.0f} MB")
+
+        start = time.perf_counter()
+        model, predict = TRAINERS[backend](X, y, w, params, rounds, spool_dir, batch_rows)
+        train_seconds = time.perf_counter() - start
+        print(f"✓ Trained {rounds} rounds in {train_seconds:.1f}s | peak RSS {peak_rss_mb():,.0f} MB")
+        del X
+
+    metrics = evaluate(predict, [path for _, path in valid], encoder)
+    print(f"✓ Validation: {metrics['rows']:,} rows | fraud rate {metrics['fraud_rate']:.2%} | "
+          f"mean score {metrics['mean_score']:.2%} | ROC AUC {metrics['roc_auc'] or float('nan'):.4f} | "
+          f"PR AUC {metrics['pr_auc'] or float('nan'):.4f}")
+
+    meta = {'trained_at': datetime.now().isoformat(timespec='seconds'), 'negative_rate': negative_rate,
+            'train_months': [m for m, _ in train_months], 'valid_months': [m for m, _ in valid],
+            'params': params, 'rounds': rounds, 'spool_seconds': round(spool_seconds, 2),
+            'train_seconds': round(train_seconds, 2), 'peak_rss_mb': round(peak_rss_mb(), 1),
+            'validation': metrics}
+    save_model(model, backend, encoder, model_dir, meta)
+    print(f"\n✅ Saved {backend} model to {model_dir} (peak RSS {meta['peak_rss_mb']:,.0f} MB)\n")
+    return model, encoder, meta
+
+
+def generate_local_dataset(work_dir, n_users=20000, n_transactions=1000000, seed=42):
+    """generate_data.py --sink parquet followed by dataset.py, for an end-to-end run without Postgres"""
+    from dataset import build_dataset
+    from generate_data import main
+
+    raw_dir = os.path.join(work_dir, 'raw')
+    dataset_dir = os.path.join(work_dir, 'dataset')
+    main(['--users', str(n_users), '--transactions', str(n_transactions), '--seed', str(seed),
+          '--sink', 'parquet', '--out-dir', raw_dir])
+    build_dataset(dataset_dir, parquet_dir=raw_dir)
+    return dataset_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Out-of-core fraud model training on dataset.py output")
+    parser.add_argument('--dataset-dir', default='dataset')
+    parser.add_argument('--model-dir', default='models/fraud')
+    parser.add_argument('--backend', choices=['auto'] + BACKENDS, default='auto')
+    parser.add_argument('--negative-rate', type=float, default=0.1, help="share of non-fraud rows kept")
+    parser.add_argument('--valid-months', type=int, default=2, help="most recent months held out")
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--learning-rate', type=float, default=0.1)
+    parser.add_argument('--max-depth', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--generate', type=int, nargs=2, metavar=('USERS', 'TRANSACTIONS'),
+                        help="first generate a Parquet dataset under --work-dir and build features from it")
+    parser.add_argument('--work-dir', default='work')
+    args = parser.parse_args()
+
+    dataset_dir = args.dataset_dir
+    if args.generate:
+        dataset_dir = generate_local_dataset(args.work_dir, *args.generate, seed=args.seed)
+    train(dataset_dir, args.model_dir, backend=args.backend, negative_rate=args.negative_rate,
+          valid_months=args.valid_months, rounds=args.rounds, learning_rate=args.learning_rate,
+          max_depth=args.max_depth, seed=args.seed)
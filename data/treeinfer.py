@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+
+def save_arrays(directory, meta, arrays):
+    """meta.json plus one .npy per array (np.load(mmap_mode='r') then shares the pages between processes)"""
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array))
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump({**meta, 'arrays': list(arrays)}, f, indent=2)
+
+
+def load_arrays(directory, mmap=True):
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None)
+              for name in meta['arrays']}
+    return meta, arrays
+
+
+def node_depths(children_left, children_right):
+    """Depth of every node of a tree given as child arrays (-1 for leaves, children after parents)"""
+    depth = np.zeros(len(children_left), dtype=np.int64)
+    for node in range(len(children_left)):
+        if children_left[node] != -1:
+            depth[children_left[node]] = depth[children_right[node]] = depth[node] + 1
+    return depth
+
+
+class FlatForest:
+    """A tree ensemble as flat NumPy node arrays, scored level by level for whole batches.
+
+    Every tree is laid out breadth-first after the previous one, so a node's right child is always
+    left + 1 and one step of the walk is four gathers: feature, value of that feature, threshold and
+    left child. A row goes left when x <= threshold, and missing values (NaN) follow default_left.
+    Leaves have threshold +inf and point to themselves, so all rows can take max_depth steps. raw()
+    sums leaf values over trees plus base_score, which is the margin of a boosted model.
+    """
+
+    def __init__(self, feature, threshold, left, default_left, value, roots, max_depth, base_score=0.0):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.base_score = base_score
+
+    def __len__(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_trees(cls, trees, base_score=0.0):
+        """Build from per-tree dicts of node arrays: children_left/children_right (-1 at leaves),
+        feature, threshold, default_left and value (read at leaves)"""
+        features, thresholds, lefts, defaults, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            children_left = np.asarray(tree['children_left'])
+            children_right = np.asarray(tree['children_right'])
+            order, depth = [0], [0]
+            for node, d in zip(order, depth):  # grows while iterating: a BFS queue
+                if children_left[node] != -1:
+                    order += [children_left[node], children_right[node]]
+                    depth += [d + 1, d + 1]
+            order = np.asarray(order)
+            position = np.empty(len(children_left), dtype=np.int64)
+            position[order] = np.arange(len(order))
+            max_depth = max(max_depth, max(depth))
+
+            is_leaf = children_left[order] == -1
+            features.append(np.where(is_leaf, 0, np.asarray(tree['feature'])[order]))
+            thresholds.append(np.where(is_leaf, np.inf, np.asarray(tree['threshold'], dtype=np.float64)[order]))
+            lefts.append(np.where(is_leaf, np.arange(len(order)), position[np.maximum(children_left[order], 0)])
+                         + offset)
+            defaults.append(np.where(is_leaf, True, np.asarray(tree['default_left'], dtype=bool)[order]))
+            values.append(np.where(is_leaf, np.asarray(tree['value'], dtype=np.float64)[order], 0.0))
+            roots.append(offset)
+            offset += len(order)
+
+        return cls(np.concatenate(features).astype(np.intp), np.concatenate(thresholds),
+                   np.concatenate(lefts).astype(np.intp), np.concatenate(defaults), np.concatenate(values),
+                   np.asarray(roots, dtype=np.intp), int(max_depth), float(base_score))
+
+    def leaves(self, X):
+        """Leaf index reached by every row in every tree, shape (n_trees, n_rows)"""
+        X = np.asarray(X, dtype=np.float64)
+        n = len(X)
+        values = X.T.ravel()  # feature-major, so feature f of row r is values[f * n + r]
+        row = np.tile(np.arange(n), len(self.roots))
+        node = np.repeat(self.roots, n)
+        has_nan = np.isnan(values).any()
+        for _ in range(self.max_depth):
+            x = values.take(self.feature.take(node) * n + row)
+            go_right = x > self.threshold.take(node)  # False for NaN, ...
+            if has_nan:  # ... which then goes right unless default_left
+                go_right |= np.isnan(x) & ~self.default_left.take(node)
+            node = self.left.take(node) + go_right
+        return node.reshape(len(self.roots), n)
+
+    def raw(self, X, batch_rows=512):
+        out = np.empty(len(X))
+        for start in range(0, len(X), batch_rows):
+            batch = X[start:start + batch_rows]
+            out[start:start + len(batch)] = self.value.take(self.leaves(batch)).sum(axis=0) + self.base_score
+        return out
+
+    def predict_proba(self, X):
+        """(n, 2) class probabilities of a binary logistic model, like scikit-learn's predict_proba"""
+        p = 1.0 / (1.0 + np.exp(-self.raw(X)))
+        return np.column_stack([1.0 - p, p])
+
+    def save(self, directory, **meta):
+        arrays = {'feature': self.feature, 'threshold': self.threshold, 'left': self.left,
+                  'default_left': self.default_left, 'value': self.value, 'roots': self.roots}
+        save_arrays(directory, {'max_depth': self.max_depth, 'base_score': self.base_score, **meta}, arrays)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """(forest, meta) from save(); the node arrays are memory-mapped by default"""
+        meta, arrays = load_arrays(directory, mmap)
+        return cls(max_depth=meta['max_depth'], base_score=meta['base_score'], **arrays), meta
+
+
+def from_sklearn_hgb(model):
+    """FlatForest of a binary HistGradientBoostingClassifier (numeric splits only)"""
+    if getattr(model, 'n_trees_per_iteration_', 1) != 1:
+        raise NotImplementedError("Only binary HistGradientBoostingClassifier models are supported")
+    trees = []
+    for (predictor,) in model._predictors:
+        nodes = predictor.nodes
+        if nodes['is_categorical'].any():
+            raise NotImplementedError("Categorical splits are not supported")
+        trees.append({'children_left': np.where(nodes['is_leaf'], -1, nodes['left'].astype(np.int64)),
+                      'children_right': np.where(nodes['is_leaf'], -1, nodes['right'].astype(np.int64)),
+                      'feature': nodes['feature_idx'], 'threshold': nodes['num_threshold'],
+                      'default_left': nodes['missing_go_to_left'], 'value': nodes['value']})
+    return FlatForest.from_trees(trees, base_score=float(np.ravel(model._baseline_prediction)[0]))
+
+
+def _from_nested(root, children, is_leaf, node_fields):
+    """Number a nested JSON tree in pre-order and return its node-array dict"""
+    tree = {'children_left': [], 'children_right': [], 'feature': [], 'threshold': [], 'default_left': [],
+            'value': []}
+    stack = [(root, None, None)]
+    while stack:
+        node, parent, side = stack.pop()
+        index = len(tree['feature'])
+        if parent is not None:
+            tree[side][parent] = index
+        feature, threshold, default_left, value = node_fields(node)
+        for key, item in zip(['feature', 'threshold', 'default_left', 'value', 'children_left', 'children_right'],
+                             [feature, threshold, default_left, value, -1, -1]):
+            tree[key].append(item)
+        if not is_leaf(node):
+            left, right = children(node)
+            stack.append((right, index, 'children_right'))
+            stack.append((left, index, 'children_left'))
+    return tree
+
+
+def from_xgboost(booster):
+    """FlatForest of a binary:logistic XGBoost Booster (features named f0, f1, ... or as in the booster)"""
+    names = booster.feature_names
+    config = json.loads(booster.save_config())
+    base_score = float(str(config['learner']['learner_model_param']['base_score']).strip('[]'))
+
+    def children(node):
+        by_id = {child['nodeid']: child for child in node['children']}
+        return by_id[node['yes']], by_id[node['no']]
+
+    def node_fields(node):
+        if 'leaf' in node:
+            return 0, np.inf, True, node['leaf']
+        feature = names.index(node['split']) if names else int(node['split'].lstrip('f'))
+        # XGBoost goes left on x < t in float32; x <= the float32 just below t is the same test
+        threshold = float(np.nextafter(np.float32(node['split_condition']), np.float32(-np.inf)))
+        return feature, threshold, node['missing'] == node['yes'], 0.0
+
+    trees = [_from_nested(json.loads(dump), children, lambda node: 'leaf' in node, node_fields)
+             for dump in booster.get_dump(dump_format='json')]
+    return FlatForest.from_trees(trees, base_score=float(np.log(base_score / (1 - base_score))))
+
+
+def from_lightgbm(booster):
+    """FlatForest of a binary LightGBM Booster (numeric splits, NaN or no missing handling)"""
+    def node_fields(node):
+        if 'leaf_value' in node:
+            return 0, np.inf, True, node['leaf_value']
+        if node['decision_type'] != '<=':
+            raise NotImplementedError("Categorical splits are not supported")
+        if node['missing_type'] == 'Zero':
+            raise NotImplementedError("zero_as_missing models are not supported")
+        # missing_type 'None' scores NaN as 0.0
+        default_left = node['default_left'] if node['missing_type'] == 'NaN' else 0.0 <= node['threshold']
+        return node['split_feature'], node['threshold'], default_left, 0.0
+
+    trees = [_from_nested(info['tree_structure'], lambda n: (n['left_child'], n['right_child']),
+                          lambda n: 'leaf_value' in n, node_fields)
+             for info in booster.dump_model()['tree_info']]
+    return FlatForest.from_trees(trees)
+
+
+def convert(model):
+    """FlatForest for a model trained by train.py (any of its backends)"""
+    kind = type(model).__module__.split('.')[0]
+    if kind == 'sklearn':
+        return from_sklearn_hgb(model)
+    if kind == 'xgboost':
+        return from_xgboost(model)
+    if kind == 'lightgbm':
+        return from_lightgbm(model)
+    raise TypeError(f"Don't know how to flatten a {type(model).__name__}")
+
+
+class TreeScorer:
+    """Fraud probability for dataset.py-shaped rows from a train.py model, via FlatForest.
+
+    compile(model_dir) converts the saved model once into model_dir/flat; load() then only maps
+    those arrays and needs neither the training library nor a copy of the model per process.
+    """
+
+    def __init__(self, forest, encoder):
+        self.forest = forest
+        self.encoder = encoder
+        self.feature_names_in_ = np.asarray(encoder.columns, dtype=object)
+
+    @classmethod
+    def compile(cls, model_dir):
+        from train import load_model
+
+        model, encoder, meta = load_model(model_dir)
+        forest = convert(model)
+        forest.save(os.path.join(model_dir, 'flat'), backend=meta['backend'], features=encoder.to_dict())
+        return cls(forest, encoder)
+
+    @classmethod
+    def load(cls, model_dir, mmap=True):
+        from train import FeatureEncoder
+
+        forest, meta = FlatForest.load(os.path.join(model_dir, 'flat'), mmap=mmap)
+        return cls(forest, FeatureEncoder.from_dict(meta['features']))
+
+    def predict_proba(self, X):
+        return self.forest.predict_proba(X)
+
+    def score_frame(self, df):
+        """Fraud probability for every row of a dataset.py frame (transactions joined with KYC etc.)"""
+        return self.forest.predict_proba(self.encoder.transform(df))[:, 1]
+
+
+def benchmark(model_dir='models/fraud', dataset_dir='dataset', batch_sizes=(1, 16, 256, 4096), repeats=200):
+    """Latency per batch and rows/s of the flattened forest against the library's own predictor"""
+    import pyarrow.parquet as pq
+    from train import load_model, month_paths
+
+    model, encoder, meta = load_model(model_dir)
+    scorer = TreeScorer.compile(model_dir)
+    scorer = TreeScorer.load(model_dir)
+    _, path = month_paths(dataset_dir)[-1]
+    X = encoder.transform(pq.read_table(path, columns=encoder.columns).to_pandas()).astype(np.float64)
+
+    if meta['backend'] == 'xgboost':
+        native = lambda M: model.inplace_predict(M)
+    elif meta['backend'] == 'lightgbm':
+        native = model.predict
+    else:
+        native = lambda M: model.predict_proba(M)[:, 1]
+    flat = lambda M: scorer.predict_proba(M)[:, 1]
+
+    diff = np.abs(flat(X) - native(X)).max()
+    print(f"\n{meta['backend']} model: {len(scorer.forest)} trees, depth <= {scorer.forest.max_depth}, "
+          f"{X.shape[1]} features | max |Δp| vs native on {len(X):,} rows: {diff:.2e}\n")
+    print(f"{'Batch':>6} {'Native p50':>12} {'Flat p50':>12} {'Native rows/s':>15} {'Flat rows/s':>13} {'Speedup':>8}")
+    for batch in batch_sizes:
+        results = []
+        for fn in (native, flat):
+            latencies = []
+            for i in range(max(1, min(repeats, len(X) // batch))):
+                start_row = (i * batch) % max(len(X) - batch, 1)
+                rows = X[start_row:start_row + batch]
+                start = time.perf_counter()
+                fn(rows)
+                latencies.append(time.perf_counter() - start)
+            latencies = np.array(latencies)
+            results.append((np.median(latencies), batch / latencies.mean()))
+        (native_p50, native_rate), (flat_p50, flat_rate) = results
+        print(f"{batch:>6} {native_p50 * 1000:>10.3f}ms {flat_p50 * 1000:>10.3f}ms {native_rate:>15,.0f} "
+              f"{flat_rate:>13,.0f} {native_p50 / flat_p50:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flatten a train.py model and benchmark it against the library")
+    parser.add_argument('--model-dir', default='models/fraud')
+    parser.add_argument('--dataset-dir', default='dataset')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 256, 4096])
+    args = parser.parse_args()
+    benchmark(args.model_dir, args.dataset_dir, args.batch_sizes)
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data'))
+
+from generate import FraudDataGenerator, seed_everything  # noqa: E402
+
+
+@pytest.fixture
+def make_generator():
+    """Seeded generator with every entity table generated (small population, one year)"""
+    def make(n_users=200, seed=7, **kwargs):
+        seed_everything(seed)
+        generator = FraudDataGenerator(n_users=n_users, start_date='2024-01-01', end_date='2024-12-31', seed=seed)
+        for attr, value in kwargs.items():
+            setattr(generator, attr, value)
+        for _, _, generate in generator.entity_steps():
+            generate()
+        return generator
+    return make
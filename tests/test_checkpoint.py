@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+from checkpoint import load_checkpoint, restore_rng_state, save_checkpoint
+from generate import fake
+
+N_TRANSACTIONS = 3000
+
+
+def stream(generator, mode, **kwargs):
+    if mode == 'columnar':
+        return generator.generate_transactions_columnar(n_transactions=N_TRANSACTIONS, **kwargs)
+    return generator.generate_transactions_batch(n_transactions=N_TRANSACTIONS, **kwargs)
+
+
+@pytest.mark.parametrize('mode', ['rows', 'columnar'])
+def test_resume_from_checkpoint_matches_uninterrupted_run(make_generator, tmp_path, mode):
+    sizes = dict(batch_size=100, columnar_block_size=500)
+    uninterrupted = pd.concat(list(stream(make_generator(**sizes), mode)), ignore_index=True)
+
+    # Stop after a few batches, checkpointing after the last one as push_to_db does after a commit
+    path = str(tmp_path / 'transactions.ckpt')
+    generator = make_generator(**sizes)
+    batches = stream(generator, mode)
+    before = [next(batches) for _ in range(3)]
+    save_checkpoint(path, generator, fake, mode=mode, n_transactions=N_TRANSACTIONS,
+                    blacklisted_ips=generator.blacklisted_ips)
+    del generator, batches
+
+    # A fresh process: same entities, then RNG and stream state from the checkpoint
+    generator = make_generator(**sizes)
+    checkpoint = load_checkpoint(path)
+    restore_rng_state(generator, fake, checkpoint['rng'])
+    generator.blacklisted_ips = checkpoint['blacklisted_ips']
+    resume_state = checkpoint['stream']
+    after = list(stream(generator, mode, start_trx_id=resume_state['trx_id'], resume_state=resume_state))
+
+    pd.testing.assert_frame_equal(pd.concat(before + after, ignore_index=True), uninterrupted)
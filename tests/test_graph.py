@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from graph import USER, TransactionGraph
+
+
+@pytest.mark.parametrize('component_links', [('ip', 'id'), ('ip', 'id', 'transfer')])
+def test_streamed_updates_match_bulk_build(make_generator, component_links):
+    generator = make_generator(n_users=300)
+    transactions = pd.concat(list(generator.generate_transactions_columnar(n_transactions=6000)),
+                             ignore_index=True).sort_values(['created_at', 'trx_id'], kind='stable')
+    history, stream = transactions.iloc[:len(transactions) // 2], transactions.iloc[len(transactions) // 2:]
+
+    streamed = TransactionGraph.from_generator(generator, history, component_links=component_links)
+    records = stream.to_dict('records')
+    for event in records:
+        streamed.update(event)
+    bulk = TransactionGraph.from_generator(generator, transactions, component_links=component_links)
+
+    users = list(bulk.node_ids[USER])
+    assert sorted(users) == sorted(streamed.node_ids[USER])
+    streamed_roots = pd.Series([streamed.find(streamed.node_ids[USER][u]) for u in users])
+    bulk_roots = pd.Series([bulk.find(bulk.node_ids[USER][u]) for u in users])
+    # Same partition of users into components, with the same per-component counts
+    assert (pd.crosstab(streamed_roots, bulk_roots) > 0).sum(axis=1).max() == 1
+    assert streamed_roots.nunique() == bulk_roots.nunique()
+    assert [streamed.size[r] for r in streamed_roots] == [bulk.size[r] for r in bulk_roots]
+    assert [streamed.fraud[r] for r in streamed_roots] == [bulk.fraud[r] for r in bulk_roots]
+    assert [streamed.features(event) for event in records[-200:]] == [bulk.features(event) for event in records[-200:]]
@@ -0,0 +1,24 @@
+import hashlib
+
+from kycindex import IdentityIndex, stolen_filter
+
+
+def test_streamed_screening_matches_bulk_build(make_generator):
+    generator = make_generator(n_users=1000)
+    kyc = generator.kyc_submissions.to_frame(['id_num_hash', 'user_id', 'device_id', 'created_at'])
+    stolen_hashes = [hashlib.sha256(i.encode()).hexdigest() for i in generator.stolen_ids]
+    stolen = stolen_filter(stolen_hashes)
+
+    bulk = IdentityIndex.from_frame(kyc, stolen)
+    streamed = IdentityIndex(stolen)
+    records = kyc.sort_values('created_at')[['id_num_hash', 'user_id', 'device_id']].to_dict('records')
+    signals = [streamed.screen(record) for record in records]
+
+    assert bulk.reused() > 0
+    assert streamed.users == bulk.users
+    assert streamed.devices == bulk.devices
+    assert IdentityIndex.from_entities(generator.kyc_submissions, stolen).users == bulk.users
+    # Reused documents are flagged on a later submission; the Bloom filter has no false negatives
+    assert any(s['identity_seen'] for s in signals)
+    assert all(h in stolen for h in stolen_hashes)
+    assert [streamed.check(**r) for r in records] == [bulk.check(**r) for r in records]
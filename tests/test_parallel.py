@@ -0,0 +1,24 @@
+import pandas as pd
+
+
+def sharded(generator, n_transactions, max_workers):
+    return pd.concat(list(generator.transaction_batches(n_transactions, n_shards=4, max_workers=max_workers)),
+                     ignore_index=True)
+
+
+def test_sharded_run_is_deterministic_and_in_trx_id_order(make_generator):
+    generator = make_generator(columnar_block_size=2000)
+    first = sharded(generator, 12000, max_workers=1)
+    second = sharded(generator, 12000, max_workers=2)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert first['trx_id'].tolist() == list(range(1, len(first) + 1))
+
+
+def test_sharded_run_depends_on_seed(make_generator):
+    generator = make_generator(columnar_block_size=2000)
+    first = sharded(generator, 6000, max_workers=1)
+    generator.seed += 1
+    other = sharded(generator, 6000, max_workers=1)
+
+    assert not first['amount'].equals(other['amount'])
@@ -0,0 +1,33 @@
+from datetime import timezone
+
+import pandas as pd
+import pytest
+
+from rules import NORMAL_REASON, RULES, RuleEngine
+
+
+@pytest.mark.parametrize('seed', [3, 4])
+def test_columnar_block_matches_rule_engine(make_generator, seed):
+    """The columnar engine's array masks give the reasons the streaming RuleEngine (which the row engine
+    calls per transaction) gives for the same rows"""
+    generator = make_generator(seed=seed, columnar_block_size=20000)
+    block = next(generator.generate_transactions_columnar(n_transactions=20000))
+
+    # One block starts from empty account history, so replaying it in time order sees the same history
+    engine = RuleEngine.from_generator(generator)
+    reasons, counts = {}, {}
+    for row in block.sort_values('created_at', kind='stable').itertuples():
+        hits = engine.evaluate(row.source_account_id, row.created_at.to_pydatetime().replace(tzinfo=timezone.utc),
+                               row.amount, row.trx_type, device_ip=row.device_ip, country=row.country,
+                               currency=row.currency, fraudster=False)
+        reasons[row.Index] = engine.reason(hits, row.country, row.currency)
+        for code in hits:
+            counts[code] = counts.get(code, 0) + 1
+    reasons = pd.Series(reasons).reindex(block.index)
+
+    # Known-fraudster hits are drawn at random per transaction, so only the columnar side knows them
+    injected = block['reason'] == RULES['known_fraudster']
+    assert injected.any()
+    pd.testing.assert_series_equal(reasons[~injected], block['reason'][~injected], check_names=False)
+    assert counts == {code: n for code, n in block.attrs['rule_hits'].items() if code != 'known_fraudster'}
+    assert (block['is_fraud'] == (block['reason'] != NORMAL_REASON)).all()